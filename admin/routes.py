@@ -3,21 +3,31 @@ Admin Blueprint for Approval Workflow Management
 Handles creation and management of approval flows and rules
 """
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+from functools import wraps
+from math import ceil
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, g
 from flask_login import login_required, current_user
-from database.models import db, User, Company, ApprovalFlow, ApprovalRule
-from sqlalchemy import and_
+from auth.models import email_exists, temp_password_hash
+from database.models import db, User, Company, ApprovalFlow, ApprovalRule, RoleEnum
+from sqlalchemy import and_, func
+from sqlalchemy.orm import joinedload, load_only, selectinload
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Rule types that carry a threshold percentage.
+_THRESHOLD_RULE_TYPES = frozenset({'percentage', 'hybrid'})
+
 def admin_required(f):
 	"""Decorator to require admin role."""
+	@wraps(f)
 	def decorated_function(*args, **kwargs):
-		if current_user.role != 'Admin':
+		if '_is_admin' not in g:
+			g._is_admin = current_user.role is RoleEnum.CFO
+		if not g._is_admin:
 			flash('Access denied. Admin privileges required.', 'danger')
 			return redirect(url_for('auth.dashboard'))
 		return f(*args, **kwargs)
-	decorated_function.__name__ = f.__name__
 	return decorated_function
 
 @admin_bp.route('/dashboard')
@@ -27,14 +37,16 @@ def dashboard():
 	"""Admin dashboard showing approval flows and rules overview."""
 	company_id = current_user.company_id
 	
-	# Get approval flows for the company
-	approval_flows = ApprovalFlow.query.filter_by(company_id=company_id).order_by(ApprovalFlow.sequence_order).all()
+	# Get approval flows for the company, loading approvers in the same query
+	approval_flows = db.session.query(ApprovalFlow).options(joinedload(ApprovalFlow.approver))\
+		.filter_by(company_id=company_id).order_by(ApprovalFlow.sequence_order).all()
 	
-	# Get approval rules for the company
-	approval_rules = ApprovalRule.query.filter_by(company_id=company_id).all()
+	# Get approval rules for the company, loading specific approvers in the same query
+	approval_rules = db.session.query(ApprovalRule).options(joinedload(ApprovalRule.specific_approver))\
+		.filter_by(company_id=company_id).all()
 	
 	# Get all managers in the company for display
-	managers = User.query.filter(and_(User.company_id == company_id, User.is_manager_approver == True)).all()
+	managers = db.session.query(User).filter(and_(User.company_id == company_id, User.is_manager_approver == True)).all()
 	
 	return render_template('admin/dashboard.html', 
 	                     approval_flows=approval_flows,
@@ -48,13 +60,32 @@ def dashboard():
 def users():
 	"""List all users in the company."""
 	company_id = current_user.company_id
-	page = request.args.get('page', 1, type=int)
+	page = max(request.args.get('page', 1, type=int) or 1, 1)
+	per_page = 20
+	
+	# Fetch the page and the total in one query via a window count
+	rows = db.session.query(User, func.count().over().label('total'))\
+		.options(load_only(User.id, User.name, User.email, User.role, User.manager_id,
+		                   User.is_verified, User.created_at))\
+		.filter(User.company_id == company_id)\
+		.order_by(User.id)\
+		.limit(per_page).offset((page - 1) * per_page).all()
+	users = [row[0] for row in rows]
+	total = rows[0].total if rows else db.session.query(User).filter_by(company_id=company_id).count()
+	pages = max(1, ceil(total / per_page))
 	
-	users = User.query.filter_by(company_id=company_id).paginate(
-		page=page, per_page=20, error_out=False
-	)
+	pagination = {
+		'page': page,
+		'per_page': per_page,
+		'total': total,
+		'pages': pages,
+		'has_prev': page > 1,
+		'has_next': page < pages,
+		'prev_page': page - 1 if page > 1 else None,
+		'next_page': page + 1 if page < pages else None,
+	}
 	
-	return render_template('admin/users.html', users=users, current_user=current_user)
+	return render_template('admin/users.html', users=users, pagination=pagination, current_user=current_user)
 
 @admin_bp.route('/users/create', methods=['GET', 'POST'])
 @login_required
@@ -74,7 +105,7 @@ def create_user():
 			return redirect(url_for('admin.create_user'))
 		
 		# Check if email already exists
-		if User.query.filter_by(email=email).first():
+		if email_exists(email):
 			flash('Email already exists.', 'danger')
 			return redirect(url_for('admin.create_user'))
 		
@@ -91,7 +122,7 @@ def create_user():
 		)
 		
 		# Set default password (user will need to reset)
-		user.set_password('TempPassword123!')
+		user.password_hash = temp_password_hash('TempPassword123!')
 		
 		try:
 			db.session.add(user)
@@ -104,7 +135,7 @@ def create_user():
 			return redirect(url_for('admin.create_user'))
 	
 	# Get all managers for the dropdown
-	managers = User.query.filter(and_(
+	managers = db.session.query(User).filter(and_(
 		User.company_id == current_user.company_id,
 		User.is_manager_approver == True
 	)).all()
@@ -117,7 +148,8 @@ def create_user():
 def approval_flows():
 	"""List all approval flows for the company."""
 	company_id = current_user.company_id
-	flows = ApprovalFlow.query.filter_by(company_id=company_id).order_by(ApprovalFlow.sequence_order).all()
+	flows = db.session.query(ApprovalFlow).options(selectinload(ApprovalFlow.approver))\
+		.filter_by(company_id=company_id).order_by(ApprovalFlow.sequence_order).all()
 	
 	return render_template('admin/approval_flows.html', flows=flows, current_user=current_user)
 
@@ -162,7 +194,7 @@ def create_approval_flow():
 			return redirect(url_for('admin.create_approval_flow'))
 	
 	# Get all managers for the dropdown
-	managers = User.query.filter(and_(
+	managers = db.session.query(User).filter(and_(
 		User.company_id == current_user.company_id,
 		User.is_manager_approver == True
 	)).all()
@@ -175,7 +207,8 @@ def create_approval_flow():
 def approval_rules():
 	"""List all approval rules for the company."""
 	company_id = current_user.company_id
-	rules = ApprovalRule.query.filter_by(company_id=company_id).all()
+	rules = db.session.query(ApprovalRule).options(selectinload(ApprovalRule.specific_approver))\
+		.filter_by(company_id=company_id).all()
 	
 	return render_template('admin/approval_rules.html', rules=rules, current_user=current_user)
 
@@ -212,7 +245,7 @@ def create_approval_rule():
 		rule = ApprovalRule(
 			company_id=current_user.company_id,
 			rule_type=rule_type,
-			threshold_percent=threshold_percent if rule_type in ['percentage', 'hybrid'] else None,
+			threshold_percent=threshold_percent if rule_type in _THRESHOLD_RULE_TYPES else None,
 			specific_approver_id=int(specific_approver_id) if specific_approver_id else None,
 			hybrid_logic=hybrid_logic if rule_type == 'hybrid' else None
 		)
@@ -228,7 +261,7 @@ def create_approval_rule():
 			return redirect(url_for('admin.create_approval_rule'))
 	
 	# Get all managers for the dropdown
-	managers = User.query.filter(and_(
+	managers = db.session.query(User).filter(and_(
 		User.company_id == current_user.company_id,
 		User.is_manager_approver == True
 	)).all()
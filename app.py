@@ -1,9 +1,15 @@
-from flask import Flask
+import os
+
+from flask import Flask, request
+from flask_compress import Compress
 from flask_wtf import CSRFProtect
 from flask_migrate import Migrate
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from auth import auth_bp
+from auth.models import start_otp_cleanup
 from expenses import expenses_bp
 from auth.admin_routes import auth_admin_bp
 from dashboard import dashboard_bp
@@ -11,25 +17,49 @@ from blueprints.admin.routes import admin_bp
 from blueprints.employee.routes import employee_bp
 from manager import manager_bp
 from config import Config
-from database.models import bcrypt, db
+from database.models import bcrypt, db, password_hasher
+from json_provider import ORJSONProvider, error_response
+from rate_limit import limiter
 
 load_dotenv()
 
 csrf = CSRFProtect()
 migrate = Migrate()
+compress = Compress()
 
 
 def create_app(config_class: type[Config] = Config) -> Flask:
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(config_class)
+    app.json = ORJSONProvider(app)
+    if app.config.get("PROXY_FIX_X_FOR"):
+        # Behind a proxy every request comes from the proxy's address, which would put all
+        # clients in one rate-limit bucket; trust only X-Forwarded-For for that many hops.
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"], x_proto=0, x_host=0)
+    app.jinja_options = {**app.jinja_options, "cache_size": app.config["JINJA_CACHE_SIZE"]}
+
+    if app.config.get("JINJA_BYTECODE_CACHE"):
+        # Persist compiled templates so new worker processes skip recompilation.
+        bytecode_dir = os.path.join(app.instance_path, "jinja_cache")
+        os.makedirs(bytecode_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
 
     db.init_app(app)
+    if app.config.get("NPLUSONE_ENABLED"):
+        # Development aid (pip install nplusone): report lazy loads that should be eager.
+        from nplusone.ext.flask_sqlalchemy import NPlusOne
+
+        NPlusOne(app)
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
     csrf.init_app(app)
     migrate.init_app(app, db)
+    compress.init_app(app)
+    limiter.init_app(app)
 
-    with app.app_context():
-        db.create_all()
+    if app.config.get("AUTO_CREATE_ALL"):
+        with app.app_context():
+            db.create_all()
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(expenses_bp)
@@ -39,6 +69,18 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     app.register_blueprint(employee_bp)
     app.register_blueprint(manager_bp)
 
+    if app.config.get("JINJA_PRECOMPILE"):
+        _precompile_templates(app)
+
+    if app.config.get("OTP_CLEANUP_INTERVAL"):
+        start_otp_cleanup(app, app.config["OTP_CLEANUP_INTERVAL"])
+
+    @app.errorhandler(429)
+    def rate_limited(exc):
+        if request.is_json:
+            return error_response("Too many requests. Please try again later.", 429)
+        return exc
+
     @app.shell_context_processor
     def make_shell_context():
         return {"db": db}
@@ -46,8 +88,14 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     return app
 
 
-app = create_app()
+def _precompile_templates(app: Flask) -> None:
+    """Compile every template at startup so no worker pays for it on a first render."""
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateSyntaxError as exc:
+            app.logger.warning("Template %s failed to precompile: %s", name, exc)
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -1,25 +1,32 @@
-from flask import Blueprint, request, jsonify, session, redirect, url_for, flash
+from flask import Blueprint, jsonify, session, redirect, url_for, flash
 from database.models import User, db, RoleEnum
+from auth.models import email_exists
 from auth.role_utils import role_required
+from auth.utils import get_request_payload
+from json_provider import error_response
+from rate_limit import limiter, session_user_key
 
 auth_admin_bp = Blueprint('auth_admin', __name__, url_prefix='/auth/admin')
 
+_REQUIRED_USER_FIELDS = ('name', 'email', 'password', 'role', 'company_id')
+
 @auth_admin_bp.route('/create_user', methods=['POST'])
-@role_required('CFO')
+@limiter.limit("20 per hour", key_func=session_user_key)
+@role_required('CFO', load_user=False)
 def create_user():
-    data = request.get_json() or request.form
+    data, _ = get_request_payload()
+    if not all(map(data.get, _REQUIRED_USER_FIELDS)):
+        return error_response('Missing required fields')
+
     name = data.get('name')
     email = data.get('email')
     raw_password = data.get('password')
-    role = data.get('role', 'Employee')
+    role = data.get('role')
     manager_id = data.get('manager_id')
     company_id = data.get('company_id')
 
-    if not all([name, email, raw_password, role, company_id]):
-        return jsonify({'error': 'Missing required fields'}), 400
-
-    if User.query.filter_by(email=email).first():
-        return jsonify({'error': 'Email already exists'}), 400
+    if email_exists(email):
+        return error_response('Email already exists')
 
     user = User(
         name=name,
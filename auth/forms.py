@@ -1,6 +1,16 @@
+import re
+
 from flask_wtf import FlaskForm
 from wtforms import PasswordField, SelectField, StringField, SubmitField
-from wtforms.validators import DataRequired, Email, EqualTo, Length
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Regexp
+
+# ASCII digits only: str.isdigit() and \d also accept other scripts' digits.
+_OTP_RE = re.compile(r"\A[0-9]{6}\Z")
+
+
+def _normalize_email(value):
+	"""Strip and lowercase once, so views can use ``form.email.data`` as the lookup key."""
+	return value.strip().lower() if value else value
 
 
 class SignupForm(FlaskForm):
@@ -8,6 +18,7 @@ class SignupForm(FlaskForm):
 	email = StringField(
 		"Email",
 		validators=[DataRequired(), Email(), Length(max=120)],
+		filters=[_normalize_email],
 	)
 	company_name = StringField("Company Name", validators=[DataRequired(), Length(max=120)])
 	password = PasswordField(
@@ -23,7 +34,7 @@ class SignupForm(FlaskForm):
 
 
 class LoginForm(FlaskForm):
-	email = StringField("Email", validators=[DataRequired(), Email()])
+	email = StringField("Email", validators=[DataRequired(), Email()], filters=[_normalize_email])
 	password = PasswordField("Password", validators=[DataRequired()])
 	submit = SubmitField("Login")
 
@@ -31,20 +42,20 @@ class LoginForm(FlaskForm):
 class OTPForm(FlaskForm):
 	otp_code = StringField(
 		"One-Time Password",
-		validators=[DataRequired(), Length(min=6, max=6, message="Enter the 6-digit code.")],
+		validators=[DataRequired(), Regexp(_OTP_RE, message="Enter the 6-digit code.")],
 	)
 	submit = SubmitField("Verify OTP")
 
 
 class ForgotPasswordForm(FlaskForm):
-	email = StringField("Email", validators=[DataRequired(), Email()])
+	email = StringField("Email", validators=[DataRequired(), Email()], filters=[_normalize_email])
 	submit = SubmitField("Send OTP")
 
 
 class ResetPasswordForm(FlaskForm):
 	otp_code = StringField(
 		"One-Time Password",
-		validators=[DataRequired(), Length(min=6, max=6)],
+		validators=[DataRequired(), Regexp(_OTP_RE, message="Enter the 6-digit code.")],
 	)
 	password = PasswordField(
 		"New Password",
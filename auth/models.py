@@ -1,17 +1,52 @@
+import hashlib
+import hmac
+import threading
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 
-from flask import current_app
+from flask import Flask, current_app, g, session
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload, load_only
 
-from database.models import Company, User, db
+from argon2.exceptions import VerificationError
+
+from database.models import Company, User, db, password_hasher
 
 
 def get_user_by_email(email: str) -> Optional[User]:
-	return User.query.filter_by(email=email).first()
+	return db.session.query(User).filter_by(email=email).first()
+
+
+def email_exists(email: str) -> bool:
+	return db.session.query(db.session.query(User.id).filter_by(email=email).exists()).scalar()
 
 
 def get_user_by_id(user_id: int) -> Optional[User]:
-	return User.query.get(user_id)
+	# Nearly every caller goes on to read user.company, so load it in the same query.
+	return db.session.get(User, user_id, options=[joinedload(User.company)])
+
+
+def get_current_user() -> Optional[User]:
+	"""The logged-in user (with company), loaded once per request and kept on ``g``."""
+	if "_current_user" not in g:
+		user_id = session.get("user_id")
+		g._current_user = get_user_by_id(user_id) if user_id else None
+	return g._current_user
+
+
+def get_pending_user(user_id: int) -> Optional[User]:
+	"""Load a user mid-OTP flow with only the columns those views read.
+
+	They never touch the company or the password hash (reset only overwrites it),
+	so skip the join and leave the other columns deferred.
+	"""
+	return db.session.get(
+		User,
+		user_id,
+		options=[load_only(User.id, User.is_verified, User.otp_code, User.otp_expiry)],
+	)
 
 
 def create_company(name: str, country: str, currency: str) -> Company:
@@ -21,28 +56,60 @@ def create_company(name: str, country: str, currency: str) -> Company:
 
 
 def first_company() -> Optional[Company]:
-	return Company.query.order_by(Company.created_at.asc()).first()
+	return db.session.query(Company).order_by(Company.created_at.asc()).first()
 
 
 def save_user(
 	*,
 	name: str,
 	email: str,
-	raw_password: str,
+	password_hash: str,
 	role: str,
 	company: Optional[Company] = None,
 ) -> User:
-	user = User(name=name, email=email, role=role)
+	user = User(name=name, email=email, role=role, password_hash=password_hash)
 	if company:
 		user.company = company
-	user.set_password(raw_password)
 	db.session.add(user)
 	return user
 
 
+def hash_password(raw_password: str) -> str:
+	"""Hash outside any open transaction; argon2 takes ~100ms by design."""
+	return password_hasher.hash(raw_password)
+
+
+@lru_cache(maxsize=None)
+def temp_password_hash(raw_password: str) -> str:
+	"""Hash a fixed default password once per process; never pass user input."""
+	return password_hasher.hash(raw_password)
+
+
+def verify_login(user: Optional[User], raw_password: str) -> bool:
+	if user is None:
+		try:
+			password_hasher.verify(password_hasher.dummy_hash, raw_password)
+		except VerificationError:
+			pass
+		return False
+	return user.check_password(raw_password)
+
+
+def upgrade_password_hash(user: User, raw_password: str) -> None:
+	"""Re-hash a just-verified password with the current argon2 parameters."""
+	if user.password_needs_rehash():
+		user.set_password(raw_password)
+		db.session.commit()
+
+
+def _hash_otp(otp_code: str) -> str:
+	"""HMAC-SHA256 of an OTP; only this is stored, so a leaked row does not reveal live codes."""
+	return hmac.new(current_app.config["SECRET_KEY"].encode(), otp_code.encode(), hashlib.sha256).hexdigest()
+
+
 def assign_otp(user: User, otp_code: str) -> None:
 	expiry_minutes = current_app.config.get("OTP_EXPIRY_MINUTES", 5)
-	user.otp_code = otp_code
+	user.otp_code = _hash_otp(otp_code)
 	user.otp_expiry = datetime.utcnow() + timedelta(minutes=expiry_minutes)
 
 
@@ -55,11 +122,59 @@ def is_otp_valid(user: User, submitted_code: str) -> bool:
 		return False
 	if datetime.utcnow() > user.otp_expiry:
 		return False
-	return user.otp_code == submitted_code
+	return hmac.compare_digest(user.otp_code, _hash_otp(submitted_code))
+
 
+def consume_otp(user: User, submitted_code: str) -> bool:
+	"""Check ``submitted_code`` and clear the user's OTP so it can be used only once.
 
-def clear_otp(user: User) -> None:
-	user.clear_otp()
+	The clearing UPDATE only matches while the code is still stored, so when the
+	same code is submitted twice concurrently exactly one request succeeds.
+	"""
+	if not is_otp_valid(user, submitted_code):
+		return False
+	if not user.otp_code:
+		# Development bypass: there is no stored code to consume.
+		return True
+	result = db.session.execute(
+		update(User)
+		.where(User.id == user.id, User.otp_code == user.otp_code)
+		.values(otp_code=None, otp_expiry=None)
+		.execution_options(synchronize_session=False)
+	)
+	return result.rowcount == 1
+
+
+def clear_expired_otps() -> int:
+	"""Null out every expired OTP in one UPDATE and return how many were cleared."""
+	result = db.session.execute(
+		update(User)
+		.where(User.otp_expiry < datetime.utcnow())
+		.values(otp_code=None, otp_expiry=None)
+		.execution_options(synchronize_session=False)
+	)
+	db.session.commit()
+	return result.rowcount
+
+
+def start_otp_cleanup(app: Flask, interval: float) -> threading.Thread:
+	"""Run clear_expired_otps every ``interval`` seconds on a daemon thread."""
+
+	def sweep() -> None:
+		while True:
+			time.sleep(interval)
+			with app.app_context():
+				try:
+					cleared = clear_expired_otps()
+				except Exception:  # pragma: no cover - keep sweeping after DB hiccups
+					app.logger.exception("Expired OTP sweep failed")
+					continue
+				if cleared:
+					app.logger.info("Cleared %d expired OTP(s)", cleared)
+
+	thread = threading.Thread(target=sweep, name="otp-cleanup", daemon=True)
+	thread.start()
+	return thread
 
 
 def commit_changes() -> None:
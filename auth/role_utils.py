@@ -1,8 +1,14 @@
 from functools import wraps
-from flask import session, redirect, url_for, flash
-from database.models import User
+from flask import g, session, redirect, url_for, flash
+from auth.models import get_current_user
+from database.models import User, db
 
-def role_required(role):
+def role_required(role, load_user=True):
+    """Require the logged-in user to have ``role``.
+
+    Views that never read the user pass ``load_user=False`` so the check selects
+    only the role column instead of the full user row and company.
+    """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -10,8 +16,13 @@ def role_required(role):
             if not user_id:
                 flash("Please log in to access this page.", "warning")
                 return redirect(url_for("auth.login"))
-            user = User.query.get(user_id)
-            if not user or user.role.value != role:
+            if load_user or "_current_user" in g:
+                # Kept on g, so the view's own get_current_user() reuses this row.
+                user = get_current_user()
+                user_role = user.role if user else None
+            else:
+                user_role = db.session.query(User.role).filter(User.id == user_id).scalar()
+            if user_role is None or user_role.value != role:
                 flash(f"Access denied: {role} role required.", "danger")
                 return redirect(url_for("auth.dashboard"))
             return f(*args, **kwargs)
@@ -1,93 +1,92 @@
 from datetime import datetime
 from decimal import Decimal
+from functools import wraps
+from typing import Callable, Tuple
 
+import click
 from flask import (
 	current_app,
 	flash,
 	redirect,
 	render_template,
-	request,
 	session,
 	url_for,
 )
 from sqlalchemy import func
 
+from cache import TTLCache
+from database.models import Expense, ExpenseStatus, User
+from rate_limit import limiter, pending_otp_key
+
 from . import auth_bp
 from .forms import ForgotPasswordForm, LoginForm, OTPForm, ResetPasswordForm, SignupForm
 from .models import (
 	assign_otp,
-	clear_otp,
+	clear_expired_otps,
 	commit_changes,
+	consume_otp,
 	create_company,
+	email_exists,
 	first_company,
+	get_current_user,
 	get_user_by_email,
-	get_user_by_id,
-	is_otp_valid,
+	get_pending_user,
+	hash_password,
 	save_user,
+	upgrade_password_hash,
+	verify_login,
 )
-from database.models import Expense, ExpenseStatus, User, db
 from .utils import (
-	OTPDeliveryError,
 	generate_otp,
 	get_country_choices,
 	get_currency_for_country,
-	send_otp_email,
+	queue_otp_email,
 )
 
 
-@auth_bp.before_app_request
-def ensure_country_choices_cached() -> None:
-	"""Prime the country choices cache before first request."""
-
-	if request.endpoint and request.endpoint.startswith("auth."):
-		# Access to ensure mapping is loaded; errors handled inside utility.
-		get_country_choices()
+# Rendered landing page; it has no per-user content unless messages were flashed.
+_index_page_cache = TTLCache(ttl=3600, maxsize=1)
 
 
 @auth_bp.route("/", methods=["GET"])
 def index():
-	return render_template("auth/index.html")
+	if "_flashes" in session:
+		return render_template("auth/index.html")
+	return _index_page_cache.get_or_set("index", lambda: render_template("auth/index.html"))
 
 
 @auth_bp.route("/signup", methods=["GET", "POST"])
+@limiter.limit("3 per minute;10 per hour", methods=["POST"])
 def signup():
 	form = SignupForm()
 	form.country.choices = get_country_choices()
 
 	if form.validate_on_submit():
-		existing_user = get_user_by_email(form.email.data.lower())
-		if existing_user:
+		# Slow work first, so the transaction the email check opens is not held across it.
+		currency = get_currency_for_country(form.country.data)
+		password_hash = hash_password(form.password.data)
+
+		if email_exists(form.email.data):
 			flash("Email already registered. Please log in.", "error")
 			return redirect(url_for("auth.login"))
 
-		currency = get_currency_for_country(form.country.data)
 		# Create company and make user CFO (admin)
 		company = create_company(form.company_name.data, form.country.data, currency)
 		role = "CFO"  # All signups create CFO/Admin accounts
 
 		user = save_user(
 			name=form.name.data,
-			email=form.email.data.lower(),
-			raw_password=form.password.data,
+			email=form.email.data,
+			password_hash=password_hash,
 			role=role,
 			company=company,
 		)
 
 		otp_code = generate_otp()
 		assign_otp(user, otp_code)
-
-		try:
-			send_otp_email(user.email, otp_code, "account verification")
-		except OTPDeliveryError as exc:
-			db.session.rollback()
-			flash(
-				"We couldn't send the verification email. Please check the mail settings and try again.",
-				"error",
-			)
-			current_app.logger.error("Signup OTP email failed: %s", exc)
-			return redirect(url_for("auth.signup"))
-
 		commit_changes()
+		queue_otp_email(user.email, otp_code, "account verification")
+
 		session["pending_user_id"] = user.id
 		flash("Account created! Enter the OTP we sent to verify your email.", "success")
 		return redirect(url_for("auth.otp_verify"))
@@ -95,25 +94,48 @@ def signup():
 	return render_template("auth/signup.html", form=form)
 
 
-@auth_bp.route("/otp-verify", methods=["GET", "POST"])
-def otp_verify():
-	pending_user_id = session.get("pending_user_id")
-	if not pending_user_id:
-		flash("Nothing to verify right now. Log in or sign up first.", "info")
-		return redirect(url_for("auth.login"))
+def pending_user_required(
+	session_key: str,
+	*,
+	missing: Tuple[str, str, str],
+	not_found: Tuple[str, str, str],
+) -> Callable:
+	"""Pass the user awaiting an OTP under ``session_key`` to the view.
 
-	user = get_user_by_id(pending_user_id)
-	if not user:
-		session.pop("pending_user_id", None)
-		flash("We couldn't find that account. Please sign up again.", "error")
-		return redirect(url_for("auth.signup"))
+	``missing`` and ``not_found`` are ``(message, category, endpoint)`` to flash and
+	redirect to when the session has no pending user or that user no longer exists.
+	"""
+
+	def decorator(view: Callable) -> Callable:
+		@wraps(view)
+		def wrapped(*args, **kwargs):
+			user_id = session.get(session_key)
+			user = get_pending_user(user_id) if user_id else None
+			if user is None:
+				message, category, endpoint = not_found if user_id else missing
+				session.pop(session_key, None)
+				flash(message, category)
+				return redirect(url_for(endpoint))
+			return view(user, *args, **kwargs)
 
+		return wrapped
+
+	return decorator
+
+
+@auth_bp.route("/otp-verify", methods=["GET", "POST"])
+@limiter.limit("5 per minute", methods=["POST"], key_func=pending_otp_key("pending_user_id"))
+@pending_user_required(
+	"pending_user_id",
+	missing=("Nothing to verify right now. Log in or sign up first.", "info", "auth.login"),
+	not_found=("We couldn't find that account. Please sign up again.", "error", "auth.signup"),
+)
+def otp_verify(user: User):
 	form = OTPForm()
 	if form.validate_on_submit():
 		submitted_code = form.otp_code.data.strip()
-		if is_otp_valid(user, submitted_code):
+		if consume_otp(user, submitted_code):
 			user.is_verified = True
-			clear_otp(user)
 			commit_changes()
 			session.pop("pending_user_id", None)
 			flash("Email verified! You can log in now.", "success")
@@ -132,12 +154,17 @@ def otp_verify():
 
 
 @auth_bp.route("/login", methods=["GET", "POST"])
+@limiter.limit("10 per minute", methods=["POST"])
 def login():
 	form = LoginForm()
 
 	if form.validate_on_submit():
-		user = get_user_by_email(form.email.data.lower())
-		if not user or not user.check_password(form.password.data):
+		user = get_user_by_email(form.email.data)
+		authenticated = verify_login(user, form.password.data)
+		if authenticated:
+			upgrade_password_hash(user, form.password.data)
+
+		if not authenticated:
 			flash("Incorrect email or password.", "error")
 		elif not user.is_verified:
 			session["pending_user_id"] = user.id
@@ -154,26 +181,18 @@ def login():
 
 
 @auth_bp.route("/forgot-password", methods=["GET", "POST"])
+@limiter.limit("3 per minute;10 per hour", methods=["POST"])
 def forgot_password():
 	form = ForgotPasswordForm()
 
 	if form.validate_on_submit():
-		user = get_user_by_email(form.email.data.lower())
+		user = get_user_by_email(form.email.data)
 		if user:
 			otp_code = generate_otp()
 			assign_otp(user, otp_code)
-			try:
-				send_otp_email(user.email, otp_code, "password reset")
-			except OTPDeliveryError as exc:
-				db.session.rollback()
-				flash(
-					"We couldn't send the reset email. Update the SMTP settings and try again.",
-					"error",
-				)
-				current_app.logger.error("Password reset OTP email failed: %s", exc)
-				return redirect(url_for("auth.forgot_password"))
-
 			commit_changes()
+			queue_otp_email(user.email, otp_code, "password reset")
+
 			session["reset_user_id"] = user.id
 			flash("We've sent you a reset OTP. Enter it below.", "info")
 			return redirect(url_for("auth.reset_password"))
@@ -184,24 +203,20 @@ def forgot_password():
 
 
 @auth_bp.route("/reset-password", methods=["GET", "POST"])
-def reset_password():
-	user_id = session.get("reset_user_id")
-	if not user_id:
-		flash("Start by requesting a password reset.", "warning")
-		return redirect(url_for("auth.forgot_password"))
-
-	user = get_user_by_id(user_id)
-	if not user:
-		session.pop("reset_user_id", None)
-		flash("Something went wrong. Please request a new reset link.", "error")
-		return redirect(url_for("auth.forgot_password"))
-
+@limiter.limit("5 per minute", methods=["POST"], key_func=pending_otp_key("reset_user_id"))
+@pending_user_required(
+	"reset_user_id",
+	missing=("Start by requesting a password reset.", "warning", "auth.forgot_password"),
+	not_found=("Something went wrong. Please request a new reset link.", "error", "auth.forgot_password"),
+)
+def reset_password(user: User):
 	form = ResetPasswordForm()
 	if form.validate_on_submit():
-		if is_otp_valid(user, form.otp_code.data.strip()):
-			user.set_password(form.password.data)
+		# Hash before consume_otp's UPDATE so the row lock is not held while argon2 runs.
+		password_hash = hash_password(form.password.data)
+		if consume_otp(user, form.otp_code.data.strip()):
+			user.password_hash = password_hash
 			user.is_verified = True
-			clear_otp(user)
 			commit_changes()
 			session.pop("reset_user_id", None)
 			flash("Password updated! Log in with your new password.", "success")
@@ -226,31 +241,13 @@ def dashboard():
 		flash("Please log in to access the dashboard.", "warning")
 		return redirect(url_for("auth.login"))
 
-	user = get_user_by_id(user_id)
+	user = get_current_user()
 	if not user:
 		session.pop("user_id", None)
 		flash("Account not found. Please log in again.", "error")
 		return redirect(url_for("auth.login"))
 
-	company = user.company
-	currency = company.currency if company else current_app.config.get("DEFAULT_CURRENCY", "USD")
-
-	# Prepare context data
-	context = {
-		'user': user,
-		'company': company,
-		'current_user': user  # For template compatibility
-	}
-
-	# For admin users, add additional data
-	if user.role.value == "CFO":
-		from database.models import User
-		company_users = User.query.filter_by(company_id=company.id).all()
-		context.update({
-			'users': company_users,
-			'total_users': len(company_users)
-		})
-
+	# Every role has its own dashboard, so nothing is rendered here.
 	# Role-based dashboard routing - redirect users to their specific dashboards
 	role_redirects = {
 		"CFO": "admin.dashboard",           # Admin blueprint
@@ -275,3 +272,10 @@ def logout():
 	session.pop("user_id", None)
 	flash("Logged out successfully.", "info")
 	return redirect(url_for("auth.login"))
+
+
+@auth_bp.cli.command("clear-expired-otps")
+def clear_expired_otps_command() -> None:
+	"""Clear expired OTP codes; safe to run from cron."""
+	cleared = clear_expired_otps()
+	click.echo(f"Cleared {cleared} expired OTP(s).")
@@ -1,48 +1,96 @@
 from __future__ import annotations
 
 import logging
-import random
+import secrets
 import smtplib
-import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
-from functools import lru_cache
-from typing import Dict, List, Tuple
+from typing import Any, Callable, Dict, Mapping, Tuple
 
 import requests
-from flask import current_app
+from flask import Flask, current_app, g, request
+
+from cache import TTLCache
+from http_client import http_session
 
 REST_COUNTRIES_ENDPOINT = "https://restcountries.com/v3.1/all?fields=name,currencies"
 
+# Country data barely changes; refresh daily instead of holding the first download forever.
+# Holds the name -> currency map and the signup choices derived from it.
+_country_currency_cache = TTLCache(ttl=24 * 60 * 60, maxsize=2)
+# A failed download is remembered this long, so an outage doesn't stall every signup on it.
+_COUNTRY_FAILURE_TTL = 60
+
+# SMTP handshakes take hundreds of ms; mails are sent from here instead of the request thread.
+_email_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="email")
+
+# Bound the backlog so a signup spike cannot queue unlimited mail, and pace sends
+# so bursts do not trip the SMTP provider's rate limits.
+_EMAIL_BACKLOG = 1000
+_email_slots = threading.BoundedSemaphore(_EMAIL_BACKLOG)
+_email_pace_lock = threading.Lock()
+_last_email_sent_at = 0.0
+
+# Each email worker keeps its SMTP session open so a burst pays the TLS/AUTH handshake once.
+_smtp_local = threading.local()
+# A session used this recently is assumed alive; a failed send still reconnects once.
+_SMTP_IDLE_CHECK_SECONDS = 30
+
+
+def get_request_payload() -> Tuple[Mapping[str, Any], bool]:
+	"""Return the request body (JSON or form) and whether it was JSON, parsed once per request."""
+
+	if "_payload_cache" not in g:
+		data = request.get_json(silent=True) if request.is_json else None
+		g._payload_cache = (data, True) if isinstance(data, dict) else (request.form, False)
+	return g._payload_cache
+
 
 def generate_otp(length: int = 6) -> str:
 
-	return "".join(random.choices(string.digits, k=length))
+	# One CSPRNG draw, zero-padded; random.choices is predictable and not fit for auth codes.
+	return f"{secrets.randbelow(10 ** length):0{length}d}"
+
+
+_OTP_SUBJECT_TEMPLATE = "Your ExpensoX OTP for {purpose}"
+_OTP_BODY_TEMPLATE = (
+	"Hi,\n\n"
+	"Use the following one-time password to complete {purpose}: {otp_code}.\n"
+	"This code expires in {expiry_minutes} minutes.\n\n"
+	"If you didn't request this code, you can ignore this message.\n"
+	"\n— ExpensoX"
+)
 
 
 class OTPDeliveryError(RuntimeError):
 	"""Raised when an OTP email cannot be delivered."""
 
 
+class TransientDeliveryError(OTPDeliveryError):
+	"""Raised for SMTP/socket failures that may succeed if the send is retried."""
+
+
+def _smtp_configured(config: Mapping[str, Any]) -> bool:
+	return bool(config.get("SMTP_SERVER") and config.get("SMTP_USERNAME") and config.get("SMTP_PASSWORD"))
+
+
 def send_notification_email(recipient: str, subject: str, body: str) -> None:
 	"""Send a generic notification email via configured SMTP."""
 
+	if not _smtp_configured(current_app.config):
+		# Development mode: there is nowhere to send it, so don't tie up a worker retrying.
+		current_app.logger.info("SMTP not configured; skipping notification email to %s: %s", recipient, subject)
+		return
 	_send_via_smtp(recipient, subject, body, email_purpose="notification")
 
 
 def send_otp_email(recipient: str, otp_code: str, purpose: str) -> None:
 
-	subject = f"Your ExpensoX OTP for {purpose}"
-	body = (
-		f"Hi,\n\n"
-		f"Use the following one-time password to complete {purpose}: {otp_code}.\n"
-		f"This code expires in {current_app.config.get('OTP_EXPIRY_MINUTES', 5)} minutes.\n\n"
-		"If you didn't request this code, you can ignore this message.\n"
-		"\n— ExpensoX"
-	)
-
 	# Check if we're in development mode (no SMTP configured)
 	config = current_app.config
-	if not (config.get("SMTP_SERVER") and config.get("SMTP_USERNAME") and config.get("SMTP_PASSWORD")):
+	if not _smtp_configured(config):
 		# Development mode: print OTP to console
 		print(f"\n{'='*60}")
 		print(f"DEVELOPMENT MODE - OTP Email for {recipient}")
@@ -53,18 +101,85 @@ def send_otp_email(recipient: str, otp_code: str, purpose: str) -> None:
 		current_app.logger.info(f"Development OTP for {recipient}: {otp_code}")
 		return
 
+	subject = _OTP_SUBJECT_TEMPLATE.format(purpose=purpose)
+	body = _OTP_BODY_TEMPLATE.format(
+		purpose=purpose,
+		otp_code=otp_code,
+		expiry_minutes=config.get("OTP_EXPIRY_MINUTES", 5),
+	)
 	_send_via_smtp(recipient, subject, body, email_purpose="otp")
 
 
+def queue_otp_email(recipient: str, otp_code: str, purpose: str) -> None:
+	"""Send an OTP email in the background; the OTP must already be committed."""
+
+	_queue_email(send_otp_email, (recipient, otp_code, purpose), f"{purpose} OTP")
+
+
+def queue_notification_email(recipient: str, subject: str, body: str) -> None:
+	"""Send a notification email in the background."""
+
+	_queue_email(send_notification_email, (recipient, subject, body), "notification")
+
+
+def _queue_email(send: Callable[..., None], args: Tuple[str, ...], description: str) -> None:
+
+	app = current_app._get_current_object()
+	if not _email_slots.acquire(blocking=False):
+		app.logger.error("Email queue is full; dropping %s email to %s", description, args[0])
+		return
+	try:
+		_email_executor.submit(_deliver_email, app, send, args, description)
+	except Exception:
+		_email_slots.release()
+		raise
+
+
+def _deliver_email(app: Flask, send: Callable[..., None], args: Tuple[str, ...], description: str) -> None:
+
+	max_attempts = max(1, app.config.get("EMAIL_MAX_ATTEMPTS", 3))
+	retry_delay = app.config.get("EMAIL_RETRY_DELAY", 10)
+	send_interval = app.config.get("EMAIL_SEND_INTERVAL", 0.3)
+	recipient = args[0]
+	try:
+		with app.app_context():
+			for attempt in range(1, max_attempts + 1):
+				_wait_for_send_slot(send_interval)
+				try:
+					send(*args)
+					return
+				except TransientDeliveryError as exc:
+					if attempt == max_attempts:
+						app.logger.error("%s email to %s failed after %d attempts: %s", description, recipient, attempt, exc)
+						return
+					app.logger.warning("%s email to %s failed (attempt %d), retrying: %s", description, recipient, attempt, exc)
+					time.sleep(retry_delay * attempt)
+				except OTPDeliveryError as exc:
+					app.logger.error("%s email to %s failed: %s", description, recipient, exc)
+					return
+	finally:
+		_email_slots.release()
+
+
+def _wait_for_send_slot(interval: float) -> None:
+	"""Space sends across all email workers at least ``interval`` seconds apart."""
+
+	global _last_email_sent_at
+	with _email_pace_lock:
+		delay = _last_email_sent_at + interval - time.monotonic()
+		if delay > 0:
+			time.sleep(delay)
+		_last_email_sent_at = time.monotonic()
+
+
 def _send_via_smtp(recipient: str, subject: str, body: str, *, email_purpose: str = "otp") -> None:
 
 	config = current_app.config
-	server = config.get("SMTP_SERVER")
-	username = config.get("SMTP_USERNAME")
-	password = config.get("SMTP_PASSWORD")
-
-	if not (server and username and password):
+	if not _smtp_configured(config):
 		raise OTPDeliveryError("SMTP credentials are not fully configured.")
+	server = config["SMTP_SERVER"]
+	username = config["SMTP_USERNAME"]
+	password = config["SMTP_PASSWORD"]
 
 	port = config.get("SMTP_PORT") or 587
 	use_tls = config.get("SMTP_USE_TLS", True)
@@ -77,28 +192,101 @@ def _send_via_smtp(recipient: str, subject: str, body: str, *, email_purpose: st
 	message.set_content(body)
 
 	try:
-		with smtplib.SMTP(server, port, timeout=10) as smtp:
-			if use_tls:
-				smtp.starttls()
-			smtp.login(username, password)
+		smtp = _smtp_connection(server, port, use_tls, username, password)
+		try:
+			smtp.send_message(message)
+		except smtplib.SMTPServerDisconnected:
+			# The server dropped an idle session between the NOOP and the send; reconnect once.
+			_close_smtp_connection()
+			smtp = _smtp_connection(server, port, use_tls, username, password)
 			smtp.send_message(message)
 		current_app.logger.info("%s email sent to %s via SMTP", email_purpose.upper(), recipient)
 	except Exception as exc:  # pragma: no cover - network dependent
+		_close_smtp_connection()
 		current_app.logger.exception("Failed to send %s email via SMTP", email_purpose)
+		if _is_transient_smtp_error(exc):
+			raise TransientDeliveryError(str(exc)) from exc
 		raise OTPDeliveryError(str(exc)) from exc
 
 
-@lru_cache(maxsize=1)
+def _is_transient_smtp_error(exc: Exception) -> bool:
+	"""Dropped connections, timeouts and 4xx replies are worth retrying; bad auth or 5xx are not."""
+
+	if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+		return True
+	if isinstance(exc, smtplib.SMTPResponseException):
+		return 400 <= exc.smtp_code < 500
+	if isinstance(exc, smtplib.SMTPRecipientsRefused):
+		return all(400 <= code < 500 for code, _ in exc.recipients.values())
+	# OSError covers socket errors and timeouts; SMTPException subclasses it, so check it last.
+	return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _smtp_connection(server: str, port: int, use_tls: bool, username: str, password: str) -> smtplib.SMTP:
+	"""Return this thread's open SMTP session, reconnecting if it went stale or the settings changed."""
+
+	settings = (server, port, use_tls, username)
+	smtp = getattr(_smtp_local, "connection", None)
+	if smtp is not None and _smtp_local.settings == settings:
+		if time.monotonic() - _smtp_local.last_used < _SMTP_IDLE_CHECK_SECONDS:
+			_smtp_local.last_used = time.monotonic()
+			return smtp
+		try:
+			if smtp.noop()[0] == 250:
+				_smtp_local.last_used = time.monotonic()
+				return smtp
+		except (smtplib.SMTPException, OSError):
+			pass
+	_close_smtp_connection()
+
+	smtp = smtplib.SMTP(server, port, timeout=10)
+	try:
+		if use_tls:
+			smtp.starttls()
+		smtp.login(username, password)
+	except Exception:
+		smtp.close()
+		raise
+	_smtp_local.connection = smtp
+	_smtp_local.settings = settings
+	_smtp_local.last_used = time.monotonic()
+	return smtp
+
+
+def _close_smtp_connection() -> None:
+	smtp = getattr(_smtp_local, "connection", None)
+	_smtp_local.connection = None
+	if smtp is None:
+		return
+	try:
+		smtp.quit()
+	except (smtplib.SMTPException, OSError):
+		smtp.close()
+
+
 def fetch_country_currency_map() -> Dict[str, str]:
 	"""Fetch and cache mapping of country name to primary currency code."""
 
+	mapping = _country_currency_cache.get("countries")
+	if mapping is None:
+		mapping = _download_country_currency_map()
+		if mapping is None:
+			mapping = {"United States": current_app.config.get("DEFAULT_CURRENCY", "USD")}
+			_country_currency_cache.set("countries", mapping, ttl=_COUNTRY_FAILURE_TTL)
+		else:
+			_country_currency_cache.set("countries", mapping)
+	return mapping
+
+
+def _download_country_currency_map() -> Dict[str, str] | None:
+
 	default_currency = current_app.config.get("DEFAULT_CURRENCY", "USD")
 	try:
-		response = requests.get(REST_COUNTRIES_ENDPOINT, timeout=15)
+		response = http_session.get(REST_COUNTRIES_ENDPOINT, timeout=15)
 		response.raise_for_status()
 	except requests.RequestException as exc:  # pragma: no cover - network failure handling
 		current_app.logger.warning("Failed to fetch country data: %s", exc)
-		return {"United States": default_currency}
+		return None
 
 	country_currency: Dict[str, str] = {}
 	for item in response.json():
@@ -110,14 +298,21 @@ def fetch_country_currency_map() -> Dict[str, str]:
 			country_currency[country_name] = currency_code
 
 	if not country_currency:
-		country_currency["United States"] = default_currency
+		return None
 
 	return dict(sorted(country_currency.items(), key=lambda kv: kv[0]))
 
 
-def get_country_choices() -> List[Tuple[str, str]]:
+def get_country_choices() -> Tuple[Tuple[str, str], ...]:
+	"""Signup select choices, built once per download of the country map."""
+
 	mapping = fetch_country_currency_map()
-	return [(country, country) for country in mapping.keys()]
+	cached = _country_currency_cache.get("choices")
+	if cached is None or cached[0] is not mapping:
+		# Keyed to the map they came from, so they refresh along with it.
+		cached = (mapping, tuple((country, country) for country in mapping))
+		_country_currency_cache.set("choices", cached)
+	return cached[1]
 
 
 def get_currency_for_country(country: str) -> str:
@@ -7,13 +7,50 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 try:
-    from database.models import User, Company, RoleEnum as UserRole, db
+    from database.models import User, RoleEnum as UserRole, db
 except ImportError:
     # Fallback for different import paths
-    from app import User, Company, UserRole, db
+    from app import User, UserRole, db
+
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import joinedload
+
+from auth.models import email_exists, get_current_user, temp_password_hash
+from cache import TTLCache, invalidate_on_commit
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Dashboard user counts; cleared once a transaction writing a user row commits.
+_dashboard_stats_cache = TTLCache(ttl=120)
+# Manager dropdown options per company; cleared the same way.
+_managers_cache = TTLCache(ttl=60)
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_caches(mapper, connection, target):
+    invalidate_on_commit(target, _dashboard_stats_cache)
+    # A role or company change can move a user between entries, so drop them all.
+    invalidate_on_commit(target, _managers_cache)
+
+def _user_role_counts():
+    """Total and per-role user counts, computed in a single round-trip."""
+    counts = db.session.query(
+        func.count(User.id).label('total'),
+        *[func.count(case((User.role == role, 1))).label(role.name) for role in UserRole]
+    ).one()
+    return counts._asdict()
+
+def _company_managers(company_id):
+    """Return cached ``{id, name, email}`` dicts for the company's managers."""
+    def load():
+        rows = (db.session.query(User.id, User.name, User.email)
+                .filter(User.company_id == company_id, User.role == UserRole.MANAGER)
+                .order_by(User.name.asc())
+                .all())
+        return [{'id': row.id, 'name': row.name, 'email': row.email} for row in rows]
+    return _managers_cache.get_or_set(company_id, load)
+
 def admin_required(f):
     """Decorator to ensure only CFO/Admin users can access admin routes"""
     @wraps(f)
@@ -23,7 +60,7 @@ def admin_required(f):
             flash('Please log in to access this page.', 'error')
             return redirect(url_for('auth.login'))
         
-        user = User.query.get(user_id)
+        user = get_current_user()
         if not user or user.role != UserRole.CFO:
             flash('Access denied. Admin privileges required.', 'error')
             return redirect(url_for('auth.dashboard'))
@@ -31,12 +68,6 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_current_user():
-    """Get the current user from session"""
-    user_id = session.get("user_id")
-    if user_id:
-        return User.query.get(user_id)
-    return None
 
 @admin_bp.route('/dashboard')
 @admin_required
@@ -47,19 +78,20 @@ def dashboard():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        # Get company info
-        company = Company.query.first()
+        # Company was loaded together with the user
+        company = current_user.company
         
         # Get user statistics
-        total_users = User.query.count()
-        cfo_count = User.query.filter_by(role=UserRole.CFO).count()
-        director_count = User.query.filter_by(role=UserRole.DIRECTOR).count()
-        manager_count = User.query.filter_by(role=UserRole.MANAGER).count()
-        finance_count = User.query.filter_by(role=UserRole.FINANCE).count()
-        employee_count = User.query.filter_by(role=UserRole.EMPLOYEE).count()
+        counts = _dashboard_stats_cache.get_or_set('user_counts', _user_role_counts)
+        total_users = counts['total']
+        cfo_count = counts['CFO']
+        director_count = counts['DIRECTOR']
+        manager_count = counts['MANAGER']
+        finance_count = counts['FINANCE']
+        employee_count = counts['EMPLOYEE']
         
         # Get recent users
-        recent_users = User.query.order_by(User.id.desc()).limit(5).all()
+        recent_users = db.session.query(User).order_by(User.id.desc()).limit(5).all()
         
         stats = {
             'total_users': total_users,
@@ -80,6 +112,12 @@ def dashboard():
         flash(f'Error loading dashboard: {str(e)}', 'error')
         return redirect(url_for('auth.dashboard'))
 
+@admin_bp.route('/api/managers')
+@admin_required
+def api_managers():
+    """JSON list of the company's managers for populating dropdowns"""
+    return jsonify(_company_managers(get_current_user().company_id))
+
 @admin_bp.route('/users')
 @admin_required
 def users():
@@ -90,15 +128,16 @@ def users():
             return redirect(url_for('auth.login'))
             
         # Scope view to current company where possible
-        user_query = User.query
-        manager_query = User.query
+        user_query = db.session.query(User)
+        manager_query = db.session.query(User)
 
         if current_user.company_id:
             user_query = user_query.filter(User.company_id == current_user.company_id)
             manager_query = manager_query.filter(User.company_id == current_user.company_id)
 
-        # Get all users except the current admin for listing
+        # Get all users except the current admin for listing; each row shows its manager
         users = (user_query
+                 .options(joinedload(User.manager))
                  .filter(User.id != current_user.id)
                  .order_by(User.name.asc())
                  .all())
@@ -109,7 +148,7 @@ def users():
                            .order_by(User.name.asc())
                            .all())
 
-        company = Company.query.first()
+        company = current_user.company
         
         return render_template('admin/users.html', 
                              users=users, 
@@ -141,7 +180,7 @@ def create_user():
                 return redirect(url_for('admin.users'))
             
             # Check if user already exists
-            if User.query.filter_by(email=email).first():
+            if email_exists(email):
                 flash('User with this email already exists.', 'error')
                 return redirect(url_for('admin.users'))
             
@@ -154,12 +193,18 @@ def create_user():
                 company_id=current_user.company_id
             )
             
-            # Set manager if provided
+            # Set manager if provided, making sure they belong to the same company
             if manager_id and manager_id != '':
+                manager_company_id = db.session.scalar(
+                    db.select(User.company_id).where(User.id == int(manager_id))
+                )
+                if manager_company_id is None or manager_company_id != current_user.company_id:
+                    flash('Selected manager was not found in your company.', 'error')
+                    return redirect(url_for('admin.users'))
                 new_user.manager_id = int(manager_id)
             
             # Set default password (user will need to reset)
-            new_user.set_password('TempPass123!')
+            new_user.password_hash = temp_password_hash('TempPass123!')
             
             db.session.add(new_user)
             db.session.commit()
@@ -183,7 +228,7 @@ def company():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        company = Company.query.first()
+        company = current_user.company
         return render_template('admin/company.html', 
                              company=company,
                              current_user=current_user,
@@ -201,7 +246,7 @@ def approvals():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        company = Company.query.first()
+        company = current_user.company
         return render_template('admin/approvals.html', 
                              company=company,
                              current_user=current_user,
@@ -219,7 +264,7 @@ def expenses():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        company = Company.query.first()
+        company = current_user.company
         return render_template('admin/expenses.html', 
                              company=company,
                              current_user=current_user,
@@ -237,7 +282,7 @@ def reports():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        company = Company.query.first()
+        company = current_user.company
         return render_template('admin/reports.html', 
                              company=company,
                              current_user=current_user,
@@ -255,7 +300,7 @@ def notifications():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        company = Company.query.first()
+        company = current_user.company
         return render_template('admin/notifications.html', 
                              company=company,
                              current_user=current_user,
@@ -274,7 +319,7 @@ def profile():
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        company = Company.query.first()
+        company = current_user.company
         return render_template('admin/profile.html', 
                              company=company,
                              user=current_user,
@@ -293,7 +338,7 @@ def delete_user(user_id):
         if not current_user:
             return redirect(url_for('auth.login'))
             
-        user = User.query.get_or_404(user_id)
+        user = db.get_or_404(User, user_id)
         
         # Prevent deletion of the current admin
         if user.id == current_user.id:
@@ -1,10 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, session
 from functools import wraps
 import os
 import sys
-import requests
 from datetime import datetime, date
 from decimal import Decimal
+from math import ceil
 
 # Add the parent directory to the path to import models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -15,8 +15,32 @@ except ImportError:
     # Fallback for different import paths
     from app import User, Company, UserRole, db, Expense, Category, ExpenseStatus
 
+from sqlalchemy import case, func, insert
+
+from auth.models import get_current_user
+from auth.utils import get_request_payload
+from cache import TTLCache
+from http_client import http_session
+from json_provider import error_response
+
 employee_bp = Blueprint('employee', __name__, url_prefix='/employee')
 
+# Required form/payload fields, checked with all(map(...)) so no list is built per request.
+_REQUIRED_EXPENSE_FIELDS = ('amount', 'currency', 'category_id', 'description', 'date')
+_REQUIRED_CONVERT_FIELDS = ('amount', 'from_currency', 'to_currency')
+
+# Exchange-rate tables keyed by base currency. Rates move slowly, so an hourly
+# refresh keeps the FX API call off nearly every submission and preview.
+_rates_cache = TTLCache(ttl=3600)
+
+# Currency list derived from REST Countries; it changes rarely, so refresh daily
+# instead of downloading and scanning ~250 countries on every expense form.
+_currencies_cache = TTLCache(ttl=24 * 60 * 60, maxsize=1)
+
+# Failed currency/rate downloads are remembered this long, so an upstream outage
+# doesn't make every form render and conversion wait on another slow attempt.
+_FETCH_FAILURE_TTL = 60
+
 def employee_required(f):
     """Decorator to ensure only Employee users can access employee routes"""
     @wraps(f)
@@ -26,7 +50,7 @@ def employee_required(f):
             flash('Please log in to access this page.', 'error')
             return redirect(url_for('auth.login'))
         
-        user = User.query.get(user_id)
+        user = get_current_user()
         if not user or user.role != UserRole.EMPLOYEE:
             flash('Access denied. Employee privileges required.', 'error')
             return redirect(url_for('auth.login'))
@@ -34,17 +58,21 @@ def employee_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_current_user():
-    """Get the current user from session"""
-    user_id = session.get("user_id")
-    if user_id:
-        return User.query.get(user_id)
-    return None
-
 def fetch_currencies():
-    """Fetch currencies from REST Countries API"""
+    """Fetch currencies from REST Countries API, cached for a day"""
+    currencies = _currencies_cache.get('currencies')
+    if currencies is None:
+        currencies = _download_currencies()
+        if currencies is None:
+            currencies = get_fallback_currencies()
+            _currencies_cache.set('currencies', currencies, ttl=_FETCH_FAILURE_TTL)
+        else:
+            _currencies_cache.set('currencies', currencies)
+    return currencies
+
+def _download_currencies():
     try:
-        response = requests.get('https://restcountries.com/v3.1/all?fields=name,currencies', timeout=10)
+        response = http_session.get('https://restcountries.com/v3.1/all?fields=name,currencies', timeout=10)
         if response.status_code == 200:
             countries = response.json()
             currencies = {}
@@ -59,13 +87,11 @@ def fetch_currencies():
                             }
             
             # Sort currencies by code
-            return sorted(currencies.values(), key=lambda x: x['code'])
-        else:
-            # Fallback currencies if API fails
-            return get_fallback_currencies()
+            return sorted(currencies.values(), key=lambda x: x['code']) or None
+        return None
     except Exception as e:
         print(f"Error fetching currencies: {e}")
-        return get_fallback_currencies()
+        return None
 
 def get_fallback_currencies():
     """Fallback currency list"""
@@ -81,18 +107,36 @@ def get_fallback_currencies():
         {'code': 'INR', 'name': 'Indian Rupee'},
     ]
 
+def _fetch_rates(base_currency):
+    response = http_session.get(f'https://api.exchangerate-api.com/v4/latest/{base_currency}', timeout=10)
+    response.raise_for_status()
+    return response.json()['rates']
+
+def _rates_for(base_currency):
+    """Rates table for ``base_currency``; a failed fetch is remembered as empty briefly"""
+    rates = _rates_cache.get(base_currency)
+    if rates is None:
+        try:
+            rates = _fetch_rates(base_currency)
+        except Exception as e:
+            current_app.logger.warning("Fetching %s exchange rates failed: %s", base_currency, e)
+            rates = {}
+            _rates_cache.set(base_currency, rates, ttl=_FETCH_FAILURE_TTL)
+        else:
+            _rates_cache.set(base_currency, rates)
+    return rates
+
 def convert_currency(amount, from_currency, to_currency):
     """Convert currency using exchange rate API"""
     if from_currency == to_currency:
         return amount
     
     try:
-        response = requests.get(f'https://api.exchangerate-api.com/v4/latest/{from_currency}', timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if to_currency in data['rates']:
-                rate = data['rates'][to_currency]
-                return round(float(amount) * rate, 2)
+        # One rates table per base currency serves every target
+        rates = _rates_for(from_currency)
+        if to_currency in rates:
+            rate = rates[to_currency]
+            return round(float(amount) * rate, 2)
     except Exception as e:
         print(f"Error converting currency: {e}")
     
@@ -109,6 +153,11 @@ def submit_expense():
     
     if request.method == 'POST':
         try:
+            # Validation
+            if not all(map(request.form.get, _REQUIRED_EXPENSE_FIELDS)):
+                flash('All fields are required.', 'error')
+                return redirect(url_for('employee.submit_expense'))
+
             # Get form data
             amount = request.form.get('amount')
             currency = request.form.get('currency')
@@ -116,11 +165,6 @@ def submit_expense():
             description = request.form.get('description')
             expense_date = request.form.get('date')
             
-            # Validation
-            if not all([amount, currency, category_id, description, expense_date]):
-                flash('All fields are required.', 'error')
-                return redirect(url_for('employee.submit_expense'))
-            
             try:
                 amount = float(amount)
                 category_id = int(category_id)
@@ -138,8 +182,9 @@ def submit_expense():
             # Convert to company currency
             converted_amount = convert_currency(amount, currency, company.currency)
             
-            # Create expense
-            expense = Expense(
+            # Create expense with a Core insert: the row is never read back before
+            # the redirect, so skip building and tracking an ORM instance for it
+            db.session.execute(insert(Expense).values(
                 employee_id=current_user.id,
                 company_id=company.id,
                 amount=amount,
@@ -150,9 +195,7 @@ def submit_expense():
                 date=expense_date,
                 status='PENDING',
                 current_approver_id=current_user.manager_id if current_user.manager_id else None
-            )
-            
-            db.session.add(expense)
+            ))
             db.session.commit()
             
             flash('Expense submitted successfully!', 'success')
@@ -165,7 +208,7 @@ def submit_expense():
     
     # GET request - show form
     try:
-        categories = (Category.query
+        categories = (db.session.query(Category)
                                .filter_by(company_id=current_user.company_id)
                                .order_by(Category.name.asc())
                                .all())
@@ -178,14 +221,14 @@ def submit_expense():
                 ("Meals", "Food and hospitality expenses"),
                 ("Supplies", "Office and work-related supplies"),
             ]
-            for name, description in default_categories:
-                db.session.add(Category(
-                    name=name,
-                    description=description,
-                    company_id=current_user.company_id
-                ))
+            categories = [
+                Category(name=name, description=description, company_id=current_user.company_id)
+                for name, description in default_categories
+            ]
+            db.session.add_all(categories)
             db.session.commit()
-            categories = (Category.query
+            # One SELECT refreshes every seeded row expired by the commit.
+            categories = (db.session.query(Category)
                                    .filter_by(company_id=current_user.company_id)
                                    .order_by(Category.name.asc())
                                    .all())
@@ -215,12 +258,57 @@ def expense_history():
     if not current_user:
         return redirect(url_for('auth.login'))
     
+    page = request.args.get('page', type=int, default=1)
+    per_page = request.args.get('per_page', type=int, default=20)
+    if page is None or page < 1:
+        page = 1
+    if per_page is None or per_page < 1:
+        per_page = 20
+    per_page = min(per_page, 100)
+
     try:
-        # Get all expenses for the current user
-        expenses = Expense.query.filter_by(employee_id=current_user.id).order_by(Expense.created_at.desc()).all()
-        
+        # Totals come from one aggregate so only the current page of rows is loaded
+        total, pending, approved, rejected = (
+            db.session.query(
+                func.count(Expense.id),
+                func.count(case((Expense.status == 'PENDING', 1))),
+                func.count(case((Expense.status == 'APPROVED', 1))),
+                func.count(case((Expense.status == 'REJECTED', 1))),
+            )
+            .filter(Expense.employee_id == current_user.id)
+            .one()
+        )
+        stats = {
+            'total': total,
+            'pending': pending,
+            'approved': approved,
+            'rejected': rejected,
+        }
+
+        pages = max(1, ceil(total / per_page)) if total else 1
+        if page > pages:
+            page = pages
+        expenses = (db.session.query(Expense).filter_by(employee_id=current_user.id)
+                    .order_by(Expense.created_at.desc())
+                    .offset((page - 1) * per_page)
+                    .limit(per_page)
+                    .all()) if total else []
+
+        pagination = {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': pages,
+            'has_prev': page > 1,
+            'has_next': page < pages,
+            'prev_page': page - 1 if page > 1 else None,
+            'next_page': page + 1 if page < pages else None,
+        }
+
         return render_template('employee/expense_history.html',
                              expenses=expenses,
+                             stats=stats,
+                             pagination=pagination,
                              current_user=current_user,
                              current_page='expense_history')
     except Exception as e:
@@ -236,14 +324,20 @@ def dashboard():
         return redirect(url_for('auth.login'))
     
     try:
-        # Get expense statistics
-        total_expenses = Expense.query.filter_by(employee_id=current_user.id).count()
-        pending_expenses = Expense.query.filter_by(employee_id=current_user.id, status='PENDING').count()
-        approved_expenses = Expense.query.filter_by(employee_id=current_user.id, status='APPROVED').count()
-        rejected_expenses = Expense.query.filter_by(employee_id=current_user.id, status='REJECTED').count()
+        # Get expense statistics in a single aggregate query
+        total_expenses, pending_expenses, approved_expenses, rejected_expenses = (
+            db.session.query(
+                func.count(Expense.id),
+                func.count(case((Expense.status == 'PENDING', 1))),
+                func.count(case((Expense.status == 'APPROVED', 1))),
+                func.count(case((Expense.status == 'REJECTED', 1))),
+            )
+            .filter(Expense.employee_id == current_user.id)
+            .one()
+        )
         
         # Get recent expenses
-        recent_expenses = Expense.query.filter_by(employee_id=current_user.id).order_by(Expense.created_at.desc()).limit(5).all()
+        recent_expenses = db.session.query(Expense).filter_by(employee_id=current_user.id).order_by(Expense.created_at.desc()).limit(5).all()
         
         stats = {
             'total_expenses': total_expenses,
@@ -281,7 +375,7 @@ def profile():
             
             if email and email != current_user.email:
                 # Check if email already exists
-                existing_user = User.query.filter_by(email=email).first()
+                existing_user = db.session.query(User).filter_by(email=email).first()
                 if existing_user and existing_user.id != current_user.id:
                     flash('Email already in use.', 'error')
                     return redirect(url_for('employee.profile'))
@@ -334,19 +428,23 @@ def api_currencies():
 @employee_required
 def api_convert():
     """API endpoint to convert currency"""
-    data = request.get_json()
-    amount = data.get('amount')
+    data, _ = get_request_payload()
+    if not all(map(data.get, _REQUIRED_CONVERT_FIELDS)):
+        return error_response('Missing required parameters')
+
     from_currency = data.get('from_currency')
     to_currency = data.get('to_currency')
-    
-    if not all([amount, from_currency, to_currency]):
-        return jsonify({'error': 'Missing required parameters'}), 400
+    try:
+        amount = float(data.get('amount'))
+    except (TypeError, ValueError):
+        return error_response('Invalid amount')
     
     try:
-        converted_amount = convert_currency(float(amount), from_currency, to_currency)
+        converted_amount = convert_currency(amount, from_currency, to_currency)
         return jsonify({
             'converted_amount': converted_amount,
-            'rate': converted_amount / float(amount) if float(amount) > 0 else 0
+            'rate': converted_amount / amount if amount > 0 else 0
         })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+    except Exception:
+        current_app.logger.exception("Currency conversion failed")
+        return error_response('Internal error', 500)
\ No newline at end of file
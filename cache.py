@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+
+class TTLCache:
+	"""Small thread-safe in-process cache whose entries expire after ``ttl`` seconds."""
+
+	def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+		self.ttl = ttl
+		self.maxsize = maxsize
+		self._data: Dict[Hashable, Tuple[float, Any]] = {}
+		self._lock = threading.Lock()
+
+	def get(self, key: Hashable, default: Any = None) -> Any:
+		with self._lock:
+			entry = self._data.get(key)
+			if entry is None:
+				return default
+			expires_at, value = entry
+			if expires_at < time.monotonic():
+				del self._data[key]
+				return default
+			return value
+
+	def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+		"""Store ``value``; ``ttl`` overrides the cache default, e.g. to remember failures briefly."""
+		with self._lock:
+			if len(self._data) >= self.maxsize and key not in self._data:
+				self._evict()
+			self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+	def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+		missing = object()
+		value = self.get(key, missing)
+		if value is missing:
+			value = factory()
+			self.set(key, value)
+		return value
+
+	def pop(self, key: Hashable) -> None:
+		with self._lock:
+			self._data.pop(key, None)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+
+	def _evict(self) -> None:
+		now = time.monotonic()
+		expired = [key for key, (expires_at, _) in self._data.items() if expires_at < now]
+		for key in expired:
+			del self._data[key]
+		if len(self._data) >= self.maxsize:
+			# Drop the entry closest to expiry to make room.
+			oldest = min(self._data, key=lambda key: self._data[key][0])
+			del self._data[oldest]
+
+
+_PENDING_INVALIDATIONS = "pending_cache_invalidations"
+
+
+def invalidate_on_commit(target: Any, cache: TTLCache, key: Optional[Hashable] = None) -> None:
+	"""Drop ``key`` (or everything) from ``cache`` once ``target``'s transaction commits.
+
+	Mapper events fire at flush, before the rows are visible to other connections;
+	clearing there would let a concurrent reader refill the cache with old data.
+	"""
+	session = object_session(target)
+	if session is None:
+		cache.clear() if key is None else cache.pop(key)
+		return
+	session.info.setdefault(_PENDING_INVALIDATIONS, set()).add((cache, key))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session) -> None:
+	for cache, key in session.info.pop(_PENDING_INVALIDATIONS, ()):
+		cache.clear() if key is None else cache.pop(key)
+
@@ -5,8 +5,42 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///expensox.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+    if not SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        # SQLite uses a single-file/static pool where these knobs don't apply.
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.environ.get("DB_POOL_SIZE", 20)),
+            max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", 40)),
+        )
+    AUTO_CREATE_ALL = os.environ.get("AUTO_CREATE_ALL", "true").lower() in {"1", "true", "yes"}
+    SQLALCHEMY_RECORD_QUERIES = os.environ.get("SQLALCHEMY_RECORD_QUERIES", "false").lower() in {"1", "true", "yes"}
+    NPLUSONE_ENABLED = os.environ.get("NPLUSONE_ENABLED", "false").lower() in {"1", "true", "yes"}
+    NPLUSONE_RAISE = os.environ.get("NPLUSONE_RAISE", "false").lower() in {"1", "true", "yes"}
     WTF_CSRF_ENABLED = True
+    JINJA_BYTECODE_CACHE = os.environ.get("JINJA_BYTECODE_CACHE", "true").lower() in {"1", "true", "yes"}
+    JINJA_CACHE_SIZE = int(os.environ.get("JINJA_CACHE_SIZE", 1000))
+    JINJA_PRECOMPILE = os.environ.get("JINJA_PRECOMPILE", "true").lower() in {"1", "true", "yes"}
+    COMPRESS_MIMETYPES = ["text/html", "text/css", "application/javascript", "application/json"]
+    COMPRESS_ALGORITHM = ["br", "gzip"]
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))
+    # Quality 4 keeps brotli fast enough to run per response with most of the size win.
+    COMPRESS_BR_LEVEL = int(os.environ.get("COMPRESS_BR_LEVEL", 4))
+    # Use a shared backend (e.g. redis://) when running more than one worker.
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_HEADERS_ENABLED = True
+    # Number of reverse proxies in front of the app; rate limits key on the client IP,
+    # which is only correct behind a proxy when X-Forwarded-For is trusted this many hops.
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+    # argon2id cost; lower these (e.g. 1 / 128 / 1) only for test runs.
+    ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 2))
+    ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 64 * 1024))  # KiB
+    ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 2))
     OTP_EXPIRY_MINUTES = int(os.environ.get("OTP_EXPIRY_MINUTES", 5))
+    # Seconds between background sweeps of expired OTPs; 0 disables (use the CLI from cron instead).
+    OTP_CLEANUP_INTERVAL = int(os.environ.get("OTP_CLEANUP_INTERVAL", 900))
     DEFAULT_CURRENCY = os.environ.get("DEFAULT_CURRENCY", "USD")
     SMTP_SERVER = os.environ.get("SMTP_SERVER")
     SMTP_PORT = int(os.environ.get("SMTP_PORT", 587)) if os.environ.get("SMTP_PORT") else None
@@ -14,3 +48,6 @@ class Config:
     SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
     SMTP_USE_TLS = os.environ.get("SMTP_USE_TLS", "true").lower() in {"1", "true", "yes"}
     SMTP_FROM_EMAIL = os.environ.get("SMTP_FROM_EMAIL")
+    EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 3))
+    EMAIL_RETRY_DELAY = int(os.environ.get("EMAIL_RETRY_DELAY", 10))
+    EMAIL_SEND_INTERVAL = float(os.environ.get("EMAIL_SEND_INTERVAL", 0.3))
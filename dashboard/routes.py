@@ -1,18 +1,38 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
 from database.models import User, Company, db, RoleEnum
+from auth.models import email_exists, get_current_user, temp_password_hash
 from auth.role_utils import role_required
+from auth.utils import get_request_payload
+from cache import TTLCache, invalidate_on_commit
+from json_provider import error_response
+from rate_limit import limiter, session_user_key
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+# Serialized user listings per company; cleared once a transaction writing a user row commits.
+_users_payload_cache = TTLCache(ttl=60)
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_users_payload(mapper, connection, target):
+    invalidate_on_commit(target, _users_payload_cache)
+
+# 'role' is checked separately since it defaults to 'Employee'.
+_REQUIRED_USER_FIELDS = ('name', 'email')
+_REQUIRED_ROLE_UPDATE_FIELDS = ('user_id', 'role')
+
 @dashboard_bp.route('/admin')
 @role_required('CFO')
 def admin_dashboard():
-    user_id = session.get("user_id")
-    user = User.query.get(user_id)
+    user = get_current_user()
     company = user.company
     
     # Get all company users for management
-    company_users = User.query.filter_by(company_id=company.id).all()
+    company_users = db.session.query(User).filter_by(company_id=company.id).all()
     
     context = {
         'user': user,
@@ -27,8 +47,7 @@ def admin_dashboard():
 @dashboard_bp.route('/director')
 @role_required('DIRECTOR')
 def director_dashboard():
-    user_id = session.get("user_id")
-    user = User.query.get(user_id)
+    user = get_current_user()
     company = user.company
     
     context = {
@@ -41,12 +60,11 @@ def director_dashboard():
 @dashboard_bp.route('/manager')
 @role_required('MANAGER')
 def manager_dashboard():
-    user_id = session.get("user_id")
-    user = User.query.get(user_id)
+    user = get_current_user()
     company = user.company
     
     # Get managed users
-    managed_users = User.query.filter_by(manager_id=user.id).all()
+    managed_users = db.session.query(User).filter_by(manager_id=user.id).all()
     
     context = {
         'user': user,
@@ -59,8 +77,7 @@ def manager_dashboard():
 @dashboard_bp.route('/finance')
 @role_required('FINANCE')
 def finance_dashboard():
-    user_id = session.get("user_id")
-    user = User.query.get(user_id)
+    user = get_current_user()
     company = user.company
     
     context = {
@@ -73,8 +90,7 @@ def finance_dashboard():
 @dashboard_bp.route('/employee')
 @role_required('EMPLOYEE')
 def employee_dashboard():
-    user_id = session.get("user_id")
-    user = User.query.get(user_id)
+    user = get_current_user()
     company = user.company
     
     context = {
@@ -86,23 +102,23 @@ def employee_dashboard():
 
 # CFO User Management Endpoints
 @dashboard_bp.route('/create_user', methods=['POST'])
+@limiter.limit("20 per hour", key_func=session_user_key)
 @role_required('CFO')
 def create_user():
-    user_id = session.get("user_id")
-    current_user = User.query.get(user_id)
+    current_user = get_current_user()
     
-    data = request.get_json() or request.form
+    data, _ = get_request_payload()
     name = data.get('name')
     email = data.get('email')
-    raw_password = data.get('password', 'TempPassword123!')
+    raw_password = data.get('password')
     role = data.get('role', 'Employee')
     manager_id = data.get('manager_id')
 
-    if not all([name, email, role]):
-        return jsonify({'error': 'Missing required fields'}), 400
+    if not role or not all(map(data.get, _REQUIRED_USER_FIELDS)):
+        return error_response('Missing required fields')
 
-    if User.query.filter_by(email=email).first():
-        return jsonify({'error': 'Email already exists'}), 400
+    if email_exists(email):
+        return error_response('Email already exists')
 
     try:
         user = User(
@@ -114,7 +130,10 @@ def create_user():
             is_verified=True,
             is_admin_created=True  # Mark as created by admin
         )
-        user.set_password(raw_password)
+        if raw_password:
+            user.set_password(raw_password)
+        else:
+            user.password_hash = temp_password_hash('TempPassword123!')
         
         db.session.add(user)
         db.session.commit()
@@ -125,24 +144,25 @@ def create_user():
             'role': user.role.value,
             'message': f'User {name} created successfully'
         })
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        current_app.logger.exception("Creating company user failed")
+        return error_response('Internal error', 500)
 
 @dashboard_bp.route('/update_user_role', methods=['POST'])
-@role_required('CFO')
+@role_required('CFO', load_user=False)
 def update_user_role():
-    data = request.get_json() or request.form
+    data, _ = get_request_payload()
+    if not all(map(data.get, _REQUIRED_ROLE_UPDATE_FIELDS)):
+        return error_response('Missing required fields')
+
     user_id = data.get('user_id')
     new_role = data.get('role')
     
-    if not all([user_id, new_role]):
-        return jsonify({'error': 'Missing required fields'}), 400
-    
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return error_response('User not found', 404)
             
         user.role = RoleEnum[new_role.upper()]
         db.session.commit()
@@ -151,28 +171,36 @@ def update_user_role():
             'success': True,
             'message': f'User role updated to {new_role}'
         })
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        current_app.logger.exception("Updating user role failed")
+        return error_response('Internal error', 500)
 
 @dashboard_bp.route('/get_users')
 @role_required('CFO')
 def get_users():
-    user_id = session.get("user_id")
-    current_user = User.query.get(user_id)
+    current_user = get_current_user()
     
-    users = User.query.filter_by(company_id=current_user.company_id).all()
-    users_data = []
+    users_data = _users_payload_cache.get_or_set(
+        current_user.company_id, lambda: _serialize_company_users(current_user.company_id)
+    )
     
-    for user in users:
-        users_data.append({
+    return jsonify({'users': users_data})
+
+def _serialize_company_users(company_id):
+    users = (db.session.query(User).options(joinedload(User.manager))
+             .filter_by(company_id=company_id)
+             .all())
+    return [
+        {
             'id': user.id,
             'name': user.name,
             'email': user.email,
             'role': user.role.value,
             'manager_name': user.manager.name if user.manager else None,
             'is_verified': user.is_verified,
-            'created_at': user.created_at.strftime('%Y-%m-%d')
-        })
-    
-    return jsonify({'users': users_data})
\ No newline at end of file
+            # orjson writes dates natively as YYYY-MM-DD; no per-row strftime
+            'created_at': user.created_at.date()
+        }
+        for user in users
+    ]
@@ -1,14 +1,68 @@
 from datetime import datetime
 from enum import Enum
 
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import OperationalError
 import json
 
 
 db = SQLAlchemy()
+# bcrypt is only kept to verify hashes created before the switch to argon2id.
 bcrypt = Bcrypt()
 
+# SQLSTATE Postgres reports when SELECT ... FOR UPDATE NOWAIT finds the row already locked.
+_LOCK_NOT_AVAILABLE = "55P03"
+
+
+def is_lock_not_available(exc: OperationalError) -> bool:
+	"""Whether ``exc`` means a NOWAIT row lock is held by another transaction."""
+	orig = exc.orig
+	# psycopg2 exposes the code as ``pgcode``, psycopg 3 as ``sqlstate``.
+	return (getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)) == _LOCK_NOT_AVAILABLE
+
+
+class Argon2Hasher:
+	"""argon2id password hasher configured from ``ARGON2_*`` settings, like the Bcrypt extension."""
+
+	def __init__(self) -> None:
+		# Tuned for roughly 100ms per verify on a typical app server (64 MiB, 2 lanes).
+		self._configure(time_cost=2, memory_cost=64 * 1024, parallelism=2)
+
+	def init_app(self, app) -> None:
+		self._configure(
+			time_cost=app.config.get("ARGON2_TIME_COST", 2),
+			memory_cost=app.config.get("ARGON2_MEMORY_COST", 64 * 1024),
+			parallelism=app.config.get("ARGON2_PARALLELISM", 2),
+		)
+
+	def _configure(self, **parameters: int) -> None:
+		self._hasher = PasswordHasher(**parameters)
+		self._dummy_hash = None
+
+	@property
+	def dummy_hash(self) -> str:
+		"""Hash with the current parameters, verified against for unknown emails so they cost the same."""
+		if self._dummy_hash is None:
+			self._dummy_hash = self._hasher.hash("dummy_password_do_not_use")
+		return self._dummy_hash
+
+	def hash(self, password: str) -> str:
+		return self._hasher.hash(password)
+
+	def verify(self, password_hash: str, password: str) -> bool:
+		return self._hasher.verify(password_hash, password)
+
+	def check_needs_rehash(self, password_hash: str) -> bool:
+		return self._hasher.check_needs_rehash(password_hash)
+
+
+password_hasher = Argon2Hasher()
+
+ARGON2_PREFIX = "$argon2"
+
 
 class RoleEnum(Enum):
 	CFO = "CFO"
@@ -38,6 +92,16 @@ class Company(db.Model):
 
 class User(db.Model):
 	__tablename__ = "users"
+	__table_args__ = (
+		db.Index("ix_users_company_role", "company_id", "role"),
+		# Partial where supported: only users holding an OTP, which is what the expiry sweep scans.
+		db.Index(
+			"ix_users_otp_expiry",
+			"otp_expiry",
+			postgresql_where=db.text("otp_expiry IS NOT NULL"),
+			sqlite_where=db.text("otp_expiry IS NOT NULL"),
+		),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String(120), nullable=False)
@@ -48,7 +112,7 @@ class User(db.Model):
 	manager_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
 	is_verified = db.Column(db.Boolean, default=False, nullable=False)
 	is_admin_created = db.Column(db.Boolean, default=False, nullable=False)  # Track if created by admin
-	otp_code = db.Column(db.String(6), nullable=True)
+	otp_code = db.Column(db.String(64), nullable=True)  # keyed hash, never the code itself
 	otp_expiry = db.Column(db.DateTime, nullable=True)
 	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
@@ -59,10 +123,21 @@ class User(db.Model):
 	approval_histories = db.relationship("ApprovalHistory", back_populates="approver", lazy=True)
 
 	def set_password(self, password: str) -> None:
-		self.password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+		self.password_hash = password_hasher.hash(password)
 
 	def check_password(self, password: str) -> bool:
-		return bcrypt.check_password_hash(self.password_hash, password)
+		if not self.password_hash.startswith(ARGON2_PREFIX):
+			return bcrypt.check_password_hash(self.password_hash, password)
+		try:
+			return password_hasher.verify(self.password_hash, password)
+		except (VerificationError, InvalidHashError):
+			return False
+
+	def password_needs_rehash(self) -> bool:
+		"""True for legacy bcrypt hashes or argon2 hashes made with older parameters."""
+		if not self.password_hash.startswith(ARGON2_PREFIX):
+			return True
+		return password_hasher.check_needs_rehash(self.password_hash)
 
 	def clear_otp(self) -> None:
 		self.otp_code = None
@@ -120,6 +195,7 @@ class ExpenseStatus(Enum):
 
 class ApprovalFlow(db.Model):
 	__tablename__ = "approval_flows"
+	__table_args__ = (db.Index("ix_approval_flows_company_sequence", "company_id", "sequence_order"),)
 
 	id = db.Column(db.Integer, primary_key=True)
 	company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=False)
@@ -140,7 +216,7 @@ class ApprovalRule(db.Model):
 	__tablename__ = "approval_rules"
 
 	id = db.Column(db.Integer, primary_key=True)
-	company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=False)
+	company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=False, index=True)
 	rule_type = db.Column(db.String(50), nullable=False)  # percentage, specific, hybrid
 	percentage_required = db.Column(db.Float, nullable=True)
 	specific_approver_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
@@ -156,6 +232,10 @@ class ApprovalRule(db.Model):
 
 class ApprovalHistory(db.Model):
 	__tablename__ = "approval_histories"
+	__table_args__ = (
+		db.Index("ix_approval_histories_approver_time", "approver_id", "action_time"),
+		db.Index("ix_approval_histories_expense_time", "expense_id", "action_time"),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	expense_id = db.Column(db.Integer, db.ForeignKey("expenses.id"), nullable=False)
@@ -173,6 +253,11 @@ class ApprovalHistory(db.Model):
 
 class Expense(db.Model):
 	__tablename__ = "expenses"
+	__table_args__ = (
+		db.Index("ix_expenses_employee_created", "employee_id", "created_at"),
+		db.Index("ix_expenses_approver_status_created", "current_approver_id", "status", "created_at"),
+		db.Index("ix_expenses_company_status_created", "company_id", "status", "created_at"),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	employee_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -185,6 +270,7 @@ class Expense(db.Model):
 	date = db.Column(db.Date, nullable=False)
 	status = db.Column(db.String(20), default="Pending", nullable=False)
 	current_approver_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+	approval_flow_id = db.Column(db.Integer, db.ForeignKey("approval_flows.id"), nullable=True)
 	approval_sequence = db.Column(db.Text, nullable=True)  # JSON string
 	approval_comments = db.Column(db.Text, nullable=True)  # JSON string
 	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -194,6 +280,7 @@ class Expense(db.Model):
 	approver = db.relationship("User", back_populates="approvals", foreign_keys=[current_approver_id], lazy=True)
 	company = db.relationship("Company", back_populates="expenses", lazy=True)
 	category = db.relationship("Category", back_populates="expenses", lazy=True)
+	approval_flow = db.relationship("ApprovalFlow", lazy=True)
 
 	def mark_approved(self, approver: "User", notes: str | None = None) -> None:
 		self.status = ExpenseStatus.APPROVED
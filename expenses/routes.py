@@ -1,16 +1,21 @@
 from __future__ import annotations
 
 from calendar import monthrange
-from datetime import date
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from functools import lru_cache
 from math import ceil
 
-from flask import abort, current_app, flash, redirect, render_template, request, session, url_for
-from sqlalchemy import func, or_
+from flask import abort, flash, redirect, render_template, request, url_for
+from sqlalchemy import and_, case, event, func, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload, load_only
 
-from auth.models import get_user_by_id
-from database.models import Budget, Category, Expense, ExpenseStatus, User, db, ApprovalFlow, ApprovalRule
-from auth.utils import OTPDeliveryError, send_notification_email
+from auth.models import get_current_user
+from database.models import Budget, Category, Expense, ExpenseStatus, RoleEnum, User, db, ApprovalFlow, ApprovalRule, is_lock_not_available
+from auth.utils import queue_notification_email
+from cache import TTLCache, invalidate_on_commit
 
 from . import expenses_bp
 from .forms import (
@@ -23,31 +28,113 @@ from .forms import (
 )
 
 
-def _current_user():
-    user_id = session.get("user_id")
-    if not user_id:
-        return None
-    return get_user_by_id(user_id)
+# Plain snapshots of a company's approval rules and flows, so cached entries never
+# hold ORM instances bound to an old session.
+_RuleSnapshot = namedtuple("_RuleSnapshot", "rule_type threshold_percent specific_approver_id")
+_FlowSnapshot = namedtuple("_FlowSnapshot", "id approver_id step_number")
+
+# Cleared after a local commit that touches a rule or flow; other worker processes
+# pick up changes when their entry expires, so nothing that writes may trust it.
+_approval_config_cache = TTLCache(ttl=300)
+
+# Roles allowed to manage categories/budgets and to review expenses. user.role is a
+# RoleEnum, so members are enums; the admin role is CFO, as in admin_required.
+_MANAGEMENT_ROLES = frozenset({RoleEnum.CFO, RoleEnum.MANAGER})
+
+
+@event.listens_for(ApprovalRule, "after_insert")
+@event.listens_for(ApprovalRule, "after_update")
+@event.listens_for(ApprovalRule, "after_delete")
+@event.listens_for(ApprovalFlow, "after_insert")
+@event.listens_for(ApprovalFlow, "after_update")
+@event.listens_for(ApprovalFlow, "after_delete")
+def _invalidate_approval_config(mapper, connection, target):
+    invalidate_on_commit(target, _approval_config_cache)
+
+
+# Category dropdown choices per company, for rendering the form only. Entries are
+# dropped after a local commit writing a category; submissions and the "has any
+# categories?" check read the database, since other workers' entries can be stale.
+_category_choices_cache = TTLCache(ttl=300)
+
+
+@event.listens_for(Category, "after_insert")
+@event.listens_for(Category, "after_update")
+@event.listens_for(Category, "after_delete")
+def _invalidate_category_choices(mapper, connection, target):
+    invalidate_on_commit(target, _category_choices_cache, target.company_id)
 
 
 def _require_login():
-    user = _current_user()
+    user = get_current_user()
     if not user:
         flash("Please log in to access expenses.", "warning")
     return user
 
 
+def _company_category_choices(company_id, fresh=False):
+    """Return ``(id, name)`` choices for a company's categories, sorted by name.
+
+    ``fresh`` bypasses (and refills) the cache.
+    """
+
+    def load():
+        categories = (
+            db.session.query(Category).options(load_only(Category.id, Category.name))
+            .filter_by(company_id=company_id)
+            .order_by(Category.name.asc())
+            .all()
+        )
+        return [(str(cat.id), cat.name) for cat in categories]
+
+    if fresh:
+        choices = load()
+        _category_choices_cache.set(company_id, choices)
+        return choices
+    return _category_choices_cache.get_or_set(company_id, load)
+
+
 def _ensure_company_categories(company) -> None:
-    if not company.categories:
-        default_category = Category(name="General", description="Default category", company=company)
-        db.session.add(default_category)
-        db.session.commit()
+    if _company_category_choices(company.id):
+        return
+    # An empty cached list may predate another worker's insert; ask the database.
+    has_categories = db.session.query(
+        db.session.query(Category.id).filter_by(company_id=company.id).exists()
+    ).scalar()
+    if has_categories:
+        _category_choices_cache.pop(company.id)
+        return
+    default_category = Category(name="General", description="Default category", company=company)
+    db.session.add(default_category)
+    db.session.commit()
+
+
+def _fetch_page(query, page: int, per_page: int):
+    """Return ``(items, total, page)`` with the page and its total from one window-count query.
+
+    A separate COUNT only runs when ``page`` is past the end, to clamp it to the last page.
+    """
+    rows = (
+        query.add_columns(func.count().over().label("total"))
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    if rows:
+        return [row[0] for row in rows], rows[0].total, page
+
+    total = query.order_by(None).count() if page > 1 else 0
+    if not total:
+        return [], 0, 1
+    page = ceil(total / per_page)
+    return query.offset((page - 1) * per_page).limit(per_page).all(), total, page
 
 
 def _populate_expense_form(form: ExpenseForm, company) -> None:
     form.currency.choices = [(company.currency, company.currency)]
-    categories = Category.query.filter_by(company_id=company.id).order_by(Category.name.asc()).all()
-    form.category.choices = [(str(cat.id), cat.name) for cat in categories]
+    # Validate submissions against the database so categories added or deleted by
+    # another worker are neither rejected nor accepted from a stale cache entry.
+    form.category.choices = _company_category_choices(company.id, fresh=request.method == "POST")
 
 
 @expenses_bp.route("/expenses", methods=["GET"])
@@ -56,12 +143,21 @@ def list_expenses():
     if not user:
         return redirect(url_for("auth.login"))
 
-    base_query = Expense.query.filter_by(submitted_by_user_id=user.id)
+    base_query = db.session.query(Expense).filter_by(submitted_by_user_id=user.id)
 
+    pending_count, approved_count, rejected_count = (
+        db.session.query(
+            func.count(case((Expense.status == ExpenseStatus.PENDING, 1))),
+            func.count(case((Expense.status == ExpenseStatus.APPROVED, 1))),
+            func.count(case((Expense.status == ExpenseStatus.REJECTED, 1))),
+        )
+        .filter(Expense.submitted_by_user_id == user.id)
+        .one()
+    )
     stats = {
-        "pending": base_query.filter(Expense.status == ExpenseStatus.PENDING).count(),
-        "approved": base_query.filter(Expense.status == ExpenseStatus.APPROVED).count(),
-        "rejected": base_query.filter(Expense.status == ExpenseStatus.REJECTED).count(),
+        "pending": pending_count,
+        "approved": approved_count,
+        "rejected": rejected_count,
     }
 
     status_filter_raw = request.args.get("status", "").strip()
@@ -95,12 +191,8 @@ def list_expenses():
         )
 
     filtered_query = filtered_query.order_by(Expense.submitted_at.desc())
-    total = filtered_query.count()
+    expenses, total, page = _fetch_page(filtered_query, page, per_page)
     pages = max(1, ceil(total / per_page)) if total else 1
-    if page > pages:
-        page = pages
-    offset = (page - 1) * per_page
-    expenses = filtered_query.offset(offset).limit(per_page).all() if total else []
 
     pagination = {
         "page": page,
@@ -163,8 +255,13 @@ def submit_expense():
         # Assign approval workflow based on rules
         approval_flow, initial_status = _assign_approval_workflow(expense, user)
         if approval_flow:
-            expense.approval_flow_id = approval_flow.id
+            if approval_flow.id is None:
+                # Link by object so a new flow and the expense are inserted in one flush
+                expense.approval_flow = approval_flow
+            else:
+                expense.approval_flow_id = approval_flow.id
             expense.current_approver_step = approval_flow.step_number
+            expense.current_approver_id = approval_flow.approver_id
             expense.status = initial_status
         
         db.session.add(expense)
@@ -181,7 +278,7 @@ def manage_categories():
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Admin", "Manager"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to manage categories.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
@@ -197,7 +294,7 @@ def manage_categories():
         name = form.name.data.strip()
         description = form.description.data.strip() if form.description.data else None
         duplicate = (
-            Category.query.filter(Category.company_id == company.id)
+            db.session.query(Category).filter(Category.company_id == company.id)
             .filter(func.lower(Category.name) == name.lower())
             .first()
         )
@@ -211,7 +308,7 @@ def manage_categories():
             return redirect(url_for("expenses.manage_categories"))
 
     search_query = request.args.get("q", "").strip()
-    categories_query = Category.query.filter_by(company_id=company.id)
+    categories_query = db.session.query(Category).filter_by(company_id=company.id)
     if search_query:
         like_term = f"%{search_query}%"
         categories_query = categories_query.filter(Category.name.ilike(like_term))
@@ -248,7 +345,7 @@ def edit_category(category_id: int):
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Admin", "Manager"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to manage categories.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
@@ -257,7 +354,7 @@ def edit_category(category_id: int):
         flash("You are not associated with a company yet.", "error")
         return redirect(url_for("auth.dashboard"))
 
-    category = Category.query.filter_by(id=category_id, company_id=company.id).first()
+    category = db.session.query(Category).filter_by(id=category_id, company_id=company.id).first()
     if not category:
         abort(404)
 
@@ -268,7 +365,7 @@ def edit_category(category_id: int):
         name = form.name.data.strip()
         description = form.description.data.strip() if form.description.data else None
         duplicate = (
-            Category.query.filter(Category.company_id == company.id)
+            db.session.query(Category).filter(Category.company_id == company.id)
             .filter(func.lower(Category.name) == name.lower(), Category.id != category.id)
             .first()
         )
@@ -290,7 +387,7 @@ def delete_category(category_id: int):
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Admin", "Manager"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to manage categories.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
@@ -299,7 +396,7 @@ def delete_category(category_id: int):
         flash("You are not associated with a company yet.", "error")
         return redirect(url_for("auth.dashboard"))
 
-    category = Category.query.filter_by(id=category_id, company_id=company.id).first()
+    category = db.session.query(Category).filter_by(id=category_id, company_id=company.id).first()
     if not category:
         abort(404)
 
@@ -320,10 +417,13 @@ def delete_category(category_id: int):
 
 def _get_default_budget_period() -> tuple[date, date]:
     today = date.today()
-    period_start = today.replace(day=1)
-    last_day = monthrange(today.year, today.month)[1]
-    period_end = period_start.replace(day=last_day)
-    return period_start, period_end
+    return _month_bounds(today.year, today.month)
+
+
+@lru_cache(maxsize=4)
+def _month_bounds(year: int, month: int) -> tuple[date, date]:
+    """First and last day of a month; computed once per month per process."""
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
 
 
 @expenses_bp.route("/budgets", methods=["GET", "POST"])
@@ -332,7 +432,7 @@ def manage_budgets():
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Admin", "Manager"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to manage budgets.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
@@ -341,7 +441,7 @@ def manage_budgets():
         flash("You are not associated with a company yet.", "error")
         return redirect(url_for("auth.dashboard"))
 
-    categories = Category.query.filter_by(company_id=company.id).order_by(Category.name.asc()).all()
+    categories = db.session.query(Category).filter_by(company_id=company.id).order_by(Category.name.asc()).all()
     form = BudgetForm()
     delete_form = BudgetDeleteForm()
     form.category.choices = [(category.id, category.name) for category in categories]
@@ -362,7 +462,7 @@ def manage_budgets():
         description = form.description.data.strip() if form.description.data else None
 
         duplicate = (
-            Budget.query.filter_by(company_id=company.id, category_id=category_id)
+            db.session.query(Budget).filter_by(company_id=company.id, category_id=category_id)
             .filter(Budget.period_start <= period_end, Budget.period_end >= period_start)
             .first()
         )
@@ -387,7 +487,7 @@ def manage_budgets():
         return redirect(url_for("expenses.manage_categories"))
 
     search_query = request.args.get("q", "").strip()
-    budgets_query = Budget.query.filter_by(company_id=company.id).join(Category)
+    budgets_query = db.session.query(Budget).filter_by(company_id=company.id).join(Category)
     if search_query:
         like_term = f"%{search_query}%"
         budgets_query = budgets_query.filter(Category.name.ilike(like_term))
@@ -443,7 +543,7 @@ def edit_budget(budget_id: int):
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Admin", "Manager"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to manage budgets.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
@@ -452,11 +552,11 @@ def edit_budget(budget_id: int):
         flash("You are not associated with a company yet.", "error")
         return redirect(url_for("auth.dashboard"))
 
-    budget = Budget.query.filter_by(id=budget_id, company_id=company.id).first()
+    budget = db.session.query(Budget).filter_by(id=budget_id, company_id=company.id).first()
     if not budget:
         abort(404)
 
-    categories = Category.query.filter_by(company_id=company.id).order_by(Category.name.asc()).all()
+    categories = db.session.query(Category).filter_by(company_id=company.id).order_by(Category.name.asc()).all()
     form = BudgetForm(obj=budget)
     form.category.choices = [(category.id, category.name) for category in categories]
     form.submit.label.text = "Update budget"
@@ -469,7 +569,7 @@ def edit_budget(budget_id: int):
         description = form.description.data.strip() if form.description.data else None
 
         duplicate = (
-            Budget.query.filter_by(company_id=company.id, category_id=category_id)
+            db.session.query(Budget).filter_by(company_id=company.id, category_id=category_id)
             .filter(Budget.id != budget.id)
             .filter(Budget.period_start <= period_end, Budget.period_end >= period_start)
             .first()
@@ -502,7 +602,7 @@ def delete_budget(budget_id: int):
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Admin", "Manager"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to manage budgets.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
@@ -511,7 +611,7 @@ def delete_budget(budget_id: int):
         flash("You are not associated with a company yet.", "error")
         return redirect(url_for("auth.dashboard"))
 
-    budget = Budget.query.filter_by(id=budget_id, company_id=company.id).first()
+    budget = db.session.query(Budget).filter_by(id=budget_id, company_id=company.id).first()
     if not budget:
         abort(404)
 
@@ -532,22 +632,28 @@ def manager_pending_expenses():
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Manager", "Admin"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to view approvals.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
-    pending_expenses = (
-        Expense.query.filter_by(company_id=user.company_id, status=ExpenseStatus.PENDING)
-        .order_by(Expense.submitted_at.asc())
-        .all()
+    # Queue totals are aggregated in SQL so the whole pending queue is never loaded.
+    today_start = datetime.combine(date.today(), time.min)
+    tomorrow_start = today_start + timedelta(days=1)
+    total, today_count, overdue_count, total_amount = (
+        db.session.query(
+            func.count(Expense.id),
+            func.count(case((and_(Expense.submitted_at >= today_start, Expense.submitted_at < tomorrow_start), 1))),
+            func.count(case((Expense.submitted_at < today_start, 1))),
+            func.sum(Expense.amount),
+        )
+        .filter(Expense.company_id == user.company_id, Expense.status == ExpenseStatus.PENDING)
+        .one()
     )
-
-    today = date.today()
     stats = {
-        "total": len(pending_expenses),
-        "today": sum(1 for expense in pending_expenses if expense.submitted_at.date() == today),
-        "overdue": sum(1 for expense in pending_expenses if expense.submitted_at.date() < today),
-        "total_amount": sum((expense.amount for expense in pending_expenses), Decimal("0.00")),
+        "total": total,
+        "today": today_count,
+        "overdue": overdue_count,
+        "total_amount": total_amount if total_amount is not None else Decimal("0.00"),
     }
 
     status_filter_raw = request.args.get("status", "PENDING").strip().upper()
@@ -560,7 +666,7 @@ def manager_pending_expenses():
         per_page = 10
     per_page = min(per_page, 50)
 
-    filtered_query = Expense.query.filter_by(company_id=user.company_id)
+    filtered_query = db.session.query(Expense).filter_by(company_id=user.company_id)
 
     status_filter = None
     if status_filter_raw and status_filter_raw != "ALL":
@@ -587,13 +693,12 @@ def manager_pending_expenses():
             )
         )
 
-    filtered_query = filtered_query.order_by(Expense.submitted_at.desc())
-    total = filtered_query.count()
+    # Each row shows the submitter and category, so load them with the page.
+    filtered_query = filtered_query.options(
+        joinedload(Expense.submitter), joinedload(Expense.category)
+    ).order_by(Expense.submitted_at.desc())
+    expenses, total, page = _fetch_page(filtered_query, page, per_page)
     pages = max(1, ceil(total / per_page)) if total else 1
-    if page > pages:
-        page = pages
-    offset = (page - 1) * per_page
-    expenses = filtered_query.offset(offset).limit(per_page).all() if total else []
 
     pagination = {
         "page": page,
@@ -627,11 +732,24 @@ def manager_expense_detail(expense_id: int):
     if not user:
         return redirect(url_for("auth.login"))
 
-    if user.role not in {"Manager", "Admin"}:
+    if user.role not in _MANAGEMENT_ROLES:
         flash("You do not have permission to approve expenses.", "error")
         return redirect(url_for("expenses.list_expenses"))
 
-    expense = Expense.query.filter_by(id=expense_id, company_id=user.company_id).first()
+    expense_query = db.session.query(Expense).options(
+        joinedload(Expense.submitter), joinedload(Expense.category)
+    ).filter_by(id=expense_id, company_id=user.company_id)
+    if request.method == "POST":
+        # Lock the row for the decision; a concurrent decision fails fast instead of racing.
+        expense_query = expense_query.with_for_update(nowait=True, of=Expense)
+    try:
+        expense = expense_query.first()
+    except OperationalError as exc:
+        if not is_lock_not_available(exc):
+            raise
+        db.session.rollback()
+        flash("Another approver is updating this expense. Please try again.", "warning")
+        return redirect(url_for("expenses.manager_pending_expenses"))
     if not expense:
         flash("Expense not found.", "error")
         return redirect(url_for("expenses.manager_pending_expenses"))
@@ -668,52 +786,74 @@ def manager_expense_detail(expense_id: int):
                 "— ExpensoX"
             )
             subject = f"Expense '{expense.title}' was {decision_text}"
-            try:
-                send_notification_email(expense.submitter.email, subject, body)
-            except OTPDeliveryError as exc:  # pragma: no cover - SMTP dependent
-                current_app.logger.warning(
-                    "Failed to send expense decision email for expense %s: %s", expense.id, exc
-                )
+            queue_notification_email(expense.submitter.email, subject, body)
 
         return redirect(url_for("expenses.manager_pending_expenses"))
 
     return render_template("manager/approval_detail.html", expense=expense, form=form, current_user=user)
 
 
+def _company_approval_config(company_id):
+    """Return ``(rules, flows)`` snapshots for a company, flows in sequence order."""
+
+    def load():
+        rules = [
+            # ApprovalRule has no threshold column yet; treat it as unset.
+            _RuleSnapshot(rule.rule_type, getattr(rule, "threshold_percent", None), rule.specific_approver_id)
+            for rule in db.session.query(ApprovalRule).filter_by(company_id=company_id).all()
+        ]
+        flows = [
+            _FlowSnapshot(flow.id, flow.approver_id, flow.step_number)
+            for flow in db.session.query(ApprovalFlow).filter_by(company_id=company_id)
+            .order_by(ApprovalFlow.sequence_order).all()
+        ]
+        return rules, flows
+
+    return _approval_config_cache.get_or_set(company_id, load)
+
+
+def _manager_flow(company_id, manager_id, flows):
+    """Return the step-one flow for ``manager_id``, creating it if missing."""
+    for flow in flows:
+        if flow.step_number == 1 and flow.approver_id == manager_id:
+            return flow
+
+    # The snapshot may predate another worker's insert; only the database can say it is missing.
+    flow = (
+        db.session.query(ApprovalFlow)
+        .filter_by(company_id=company_id, step_number=1, approver_id=manager_id)
+        .first()
+    )
+    if flow is not None:
+        return flow
+
+    flow = ApprovalFlow(
+        company_id=company_id,
+        step_number=1,
+        approver_id=manager_id,
+        sequence_order=1
+    )
+    db.session.add(flow)
+    return flow
+
+
 def _assign_approval_workflow(expense, user):
     """
     Assign approval workflow to an expense based on company rules.
     Returns (approval_flow, initial_status) tuple.
+
+    Rules and flows come from a per-company snapshot cache that is cleared
+    after a commit writing a rule or flow, and are matched in memory. The
+    returned flow is a snapshot, an ApprovalFlow found in the database, or a
+    new pending ApprovalFlow (``id`` None).
     """
     company_id = user.company_id
     
-    # Get approval rules for the company
-    approval_rules = ApprovalRule.query.filter_by(company_id=company_id).all()
-    
-    if not approval_rules:
-        # No rules defined, use simple manager approval if user has a manager
-        if user.manager_id:
-            # Create or get a simple manager approval flow
-            flow = ApprovalFlow.query.filter_by(
-                company_id=company_id,
-                step_number=1,
-                approver_id=user.manager_id
-            ).first()
-            
-            if not flow:
-                flow = ApprovalFlow(
-                    company_id=company_id,
-                    step_number=1,
-                    approver_id=user.manager_id,
-                    sequence_order=1
-                )
-                db.session.add(flow)
-                db.session.flush()  # Get the ID
-            
-            return flow, ExpenseStatus.IN_PROGRESS
-        else:
-            # No manager, auto-approve or keep pending
-            return None, ExpenseStatus.PENDING
+    # Get approval rules and flows for the company
+    approval_rules, flows = _company_approval_config(company_id)
+
+    def flow_for_approver(approver_id):
+        return next((flow for flow in flows if flow.approver_id == approver_id), None)
     
     # Apply approval rules
     for rule in approval_rules:
@@ -724,19 +864,14 @@ def _assign_approval_workflow(expense, user):
                 # In practice, this could be more sophisticated
                 threshold_amount = Decimal('1000.00') * (rule.threshold_percent / 100)
                 if expense.amount >= threshold_amount:
-                    # Find the first approval flow for this company
-                    flow = ApprovalFlow.query.filter_by(company_id=company_id)\
-                        .order_by(ApprovalFlow.sequence_order).first()
-                    if flow:
-                        return flow, ExpenseStatus.IN_PROGRESS
+                    # Use the first approval flow for this company
+                    if flows:
+                        return flows[0], ExpenseStatus.IN_PROGRESS
         
         elif rule.rule_type == 'specific':
             # Always route to specific approver
             if rule.specific_approver_id:
-                flow = ApprovalFlow.query.filter_by(
-                    company_id=company_id,
-                    approver_id=rule.specific_approver_id
-                ).first()
+                flow = flow_for_approver(rule.specific_approver_id)
                 if flow:
                     return flow, ExpenseStatus.IN_PROGRESS
         
@@ -744,32 +879,12 @@ def _assign_approval_workflow(expense, user):
             # Implement hybrid logic based on rule.hybrid_logic
             # For now, fall back to manager approval
             if user.manager_id:
-                flow = ApprovalFlow.query.filter_by(
-                    company_id=company_id,
-                    approver_id=user.manager_id
-                ).first()
+                flow = flow_for_approver(user.manager_id)
                 if flow:
                     return flow, ExpenseStatus.IN_PROGRESS
     
-    # Default: no specific flow matched, use manager if available
+    # No rules defined or none matched: use simple manager approval if available
     if user.manager_id:
-        # Create or get a simple manager approval flow
-        flow = ApprovalFlow.query.filter_by(
-            company_id=company_id,
-            step_number=1,
-            approver_id=user.manager_id
-        ).first()
-        
-        if not flow:
-            flow = ApprovalFlow(
-                company_id=company_id,
-                step_number=1,
-                approver_id=user.manager_id,
-                sequence_order=1
-            )
-            db.session.add(flow)
-            db.session.flush()
-        
-        return flow, ExpenseStatus.IN_PROGRESS
+        return _manager_flow(company_id, user.manager_id, flows), ExpenseStatus.IN_PROGRESS
     
-    return None, ExpenseStatus.PENDING
\ No newline at end of file
+    return None, ExpenseStatus.PENDING
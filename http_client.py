@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def _build_session() -> requests.Session:
+	# Retry gateway errors only: retrying connect/read timeouts would multiply the
+	# callers' timeouts while an upstream is down.
+	retry = Retry(
+		total=3,
+		connect=0,
+		read=0,
+		status=3,
+		backoff_factor=0.2,
+		status_forcelist=(502, 503, 504),
+		allowed_methods=frozenset({"GET"}),
+	)
+	adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+	session = requests.Session()
+	session.mount("https://", adapter)
+	session.mount("http://", adapter)
+	return session
+
+
+# Shared by the country and exchange-rate lookups so repeat calls reuse pooled
+# keep-alive connections instead of paying a TLS handshake each time.
+http_session = _build_session()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from flask import Response, current_app
+from flask.json.provider import DefaultJSONProvider
+
+
+class ORJSONProvider(DefaultJSONProvider):
+	"""Flask JSON provider backed by orjson.
+
+	``datetime`` and ``date`` values are emitted natively as ISO 8601 strings;
+	anything orjson can't handle (``Decimal``, ``UUID``, ``__html__`` objects)
+	falls back to Flask's default conversion.
+	"""
+
+	def _dumpb(self, obj: Any, **kwargs: Any) -> bytes:
+		option = orjson.OPT_NON_STR_KEYS
+		if kwargs.get("sort_keys", self.sort_keys):
+			option |= orjson.OPT_SORT_KEYS
+		if kwargs.get("indent"):
+			option |= orjson.OPT_INDENT_2
+		return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option)
+
+	def dumps(self, obj: Any, **kwargs: Any) -> str:
+		return self._dumpb(obj, **kwargs).decode("utf-8")
+
+	def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+		return orjson.loads(s)
+
+	def response(self, *args: Any, **kwargs: Any) -> Response:
+		"""Like the default ``jsonify`` response, but writes orjson's bytes directly."""
+		obj = self._prepare_response_obj(args, kwargs)
+		indent = (self.compact is None and self._app.debug) or self.compact is False
+		return self._app.response_class(self._dumpb(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+
+@lru_cache(maxsize=64)
+def _error_body(message: str) -> bytes:
+	return orjson.dumps({"error": message}) + b"\n"
+
+
+def error_response(message: str, status: int = 400) -> Response:
+	"""``{"error": message}`` JSON response whose body is serialized once per message."""
+	return current_app.response_class(_error_body(message), status=status, mimetype=current_app.json.mimetype)
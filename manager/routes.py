@@ -5,8 +5,10 @@ Handles approval dashboard, pending approvals, and approval actions
 
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
-from database.models import db, User, Expense, ApprovalHistory, ApprovalFlow, ExpenseStatus
-from sqlalchemy import and_, or_
+from database.models import db, User, Expense, ApprovalHistory, ApprovalFlow, ExpenseStatus, is_lock_not_available
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 manager_bp = Blueprint('manager', __name__, url_prefix='/manager')
@@ -21,6 +23,24 @@ def manager_required(f):
 	decorated_function.__name__ = f.__name__
 	return decorated_function
 
+def _get_expense_for_review(expense_id, for_update=False):
+	"""Fetch an expense with the submitter the permission check reads, in one query.
+
+	With ``for_update`` the expense row is locked without waiting, so two
+	approvers acting at once fail fast instead of overwriting each other.
+	"""
+	query = db.session.query(Expense).options(
+		joinedload(Expense.submitter),
+	).filter(Expense.id == expense_id)
+	if for_update:
+		query = query.with_for_update(nowait=True, of=Expense)
+	return query.first_or_404()
+
+def _expense_locked_response(expense_id):
+	db.session.rollback()
+	flash('Another approver is updating this expense. Please try again.', 'warning')
+	return redirect(url_for('manager.approval_detail', expense_id=expense_id))
+
 @manager_bp.route('/dashboard')
 @login_required
 @manager_required
@@ -28,23 +48,18 @@ def dashboard():
 	"""Manager dashboard showing approval statistics and recent activity."""
 	company_id = current_user.company_id
 	
-	# Get pending approvals count
-	pending_count = Expense.query.filter(
-		and_(
-			Expense.company_id == company_id,
-			Expense.status.in_([ExpenseStatus.PENDING, ExpenseStatus.IN_PROGRESS])
-		)
-	).count()
-	
-	# Get total expenses requiring manager approval
-	total_expenses = Expense.query.filter_by(company_id=company_id).count()
+	# Pending approvals and total expenses counted in one aggregate round-trip
+	pending_count, total_expenses = db.session.query(
+		func.count(case((Expense.status.in_([ExpenseStatus.PENDING, ExpenseStatus.IN_PROGRESS]), 1))),
+		func.count(Expense.id),
+	).filter(Expense.company_id == company_id).one()
 	
 	# Get recent approval activity for this manager
-	recent_approvals = ApprovalHistory.query.filter_by(approver_id=current_user.id)\
+	recent_approvals = db.session.query(ApprovalHistory).filter_by(approver_id=current_user.id)\
 		.order_by(ApprovalHistory.action_time.desc()).limit(10).all()
 	
 	# Get expenses directly managed by this user (their direct reports)
-	team_expenses = Expense.query.join(User, Expense.submitted_by_user_id == User.id)\
+	team_expenses = db.session.query(Expense).join(User, Expense.submitted_by_user_id == User.id)\
 		.filter(User.manager_id == current_user.id)\
 		.order_by(Expense.submitted_at.desc()).limit(10).all()
 	
@@ -65,20 +80,18 @@ def pending_approvals():
 	
 	# Get expenses that need approval from this manager
 	# This could be based on approval flows or direct manager relationship
-	pending_expenses = Expense.query.filter(
+	pending_expenses = db.session.query(Expense).options(
+		joinedload(Expense.submitter),
+		joinedload(Expense.category),
+	).filter(
 		and_(
 			Expense.company_id == company_id,
 			Expense.status.in_([ExpenseStatus.PENDING, ExpenseStatus.IN_PROGRESS]),
 			or_(
 				# Expenses from direct reports
 				Expense.submitter.has(manager_id=current_user.id),
-				# Expenses in approval flow where this manager is the current approver
-				Expense.approval_flow.has(
-					and_(
-						ApprovalFlow.approver_id == current_user.id,
-						ApprovalFlow.step_number == Expense.current_approver_step
-					)
-				)
+				# Expenses whose current approval step is assigned to this manager
+				Expense.current_approver_id == current_user.id
 			)
 		)
 	).paginate(page=page, per_page=20, error_out=False)
@@ -92,16 +105,16 @@ def pending_approvals():
 @manager_required
 def approval_detail(expense_id):
 	"""Show detailed view of an expense for approval."""
-	expense = Expense.query.get_or_404(expense_id)
+	expense = _get_expense_for_review(expense_id)
 	
 	# Check if this manager has permission to approve this expense
 	if not (expense.submitter.manager_id == current_user.id or 
-	        (expense.approval_flow and expense.approval_flow.approver_id == current_user.id)):
+	        expense.current_approver_id == current_user.id):
 		flash('You do not have permission to approve this expense.', 'danger')
 		return redirect(url_for('manager.pending_approvals'))
 	
 	# Get approval history for this expense
-	approval_history = ApprovalHistory.query.filter_by(expense_id=expense_id)\
+	approval_history = db.session.query(ApprovalHistory).filter_by(expense_id=expense_id)\
 		.order_by(ApprovalHistory.action_time.desc()).all()
 	
 	return render_template('manager/approval_detail.html',
@@ -114,12 +127,17 @@ def approval_detail(expense_id):
 @manager_required
 def approve_expense(expense_id):
 	"""Approve an expense."""
-	expense = Expense.query.get_or_404(expense_id)
+	try:
+		expense = _get_expense_for_review(expense_id, for_update=True)
+	except OperationalError as exc:
+		if not is_lock_not_available(exc):
+			raise
+		return _expense_locked_response(expense_id)
 	comment = request.form.get('comment', '')
 	
 	# Check permission
 	if not (expense.submitter.manager_id == current_user.id or 
-	        (expense.approval_flow and expense.approval_flow.approver_id == current_user.id)):
+	        expense.current_approver_id == current_user.id):
 		flash('You do not have permission to approve this expense.', 'danger')
 		return redirect(url_for('manager.pending_approvals'))
 	
@@ -136,7 +154,7 @@ def approve_expense(expense_id):
 		# Check if this is part of a multi-step approval flow
 		if expense.approval_flow_id:
 			# Get next step in approval flow
-			next_flow = ApprovalFlow.query.filter(
+			next_flow = db.session.query(ApprovalFlow).filter(
 				and_(
 					ApprovalFlow.company_id == expense.company_id,
 					ApprovalFlow.sequence_order > expense.current_approver_step
@@ -146,6 +164,7 @@ def approve_expense(expense_id):
 			if next_flow:
 				# Move to next approval step
 				expense.current_approver_step = next_flow.step_number
+				expense.current_approver_id = next_flow.approver_id
 				expense.status = ExpenseStatus.IN_PROGRESS
 			else:
 				# Final approval
@@ -168,12 +187,17 @@ def approve_expense(expense_id):
 @manager_required
 def reject_expense(expense_id):
 	"""Reject an expense."""
-	expense = Expense.query.get_or_404(expense_id)
+	try:
+		expense = _get_expense_for_review(expense_id, for_update=True)
+	except OperationalError as exc:
+		if not is_lock_not_available(exc):
+			raise
+		return _expense_locked_response(expense_id)
 	comment = request.form.get('comment', '')
 	
 	# Check permission
 	if not (expense.submitter.manager_id == current_user.id or 
-	        (expense.approval_flow and expense.approval_flow.approver_id == current_user.id)):
+	        expense.current_approver_id == current_user.id):
 		flash('You do not have permission to reject this expense.', 'danger')
 		return redirect(url_for('manager.pending_approvals'))
 	
@@ -212,7 +236,7 @@ def team_expenses():
 	status_filter = request.args.get('status', '')
 	
 	# Base query for team expenses
-	query = Expense.query.join(User, Expense.submitted_by_user_id == User.id)\
+	query = db.session.query(Expense).join(User, Expense.submitted_by_user_id == User.id)\
 		.filter(User.manager_id == current_user.id)
 	
 	# Apply status filter if provided
@@ -0,0 +1,46 @@
+"""Add approval history (approver_id, action_time) and (expense_id, action_time) indexes
+
+Revision ID: 20261016_approval_history_idx
+Revises: 20261016_expense_approval_flow
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_approval_history_idx'
+down_revision = '20261016_expense_approval_flow'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_approval_histories_approver_time', 'approval_histories', ['approver_id', 'action_time']),
+    ('ix_approval_histories_expense_time', 'approval_histories', ['expense_id', 'action_time']),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+
+    for name, table, columns in INDEXES:
+        if table in tables and name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+
+    for name, table, _ in reversed(INDEXES):
+        if table in tables and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,47 @@
+"""Add company-scoped composite indexes
+
+Revision ID: 20261016_company_indexes
+Revises: 20251004_add_budgets
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_company_indexes'
+down_revision = '20251004_add_budgets'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_users_company_role', 'users', ['company_id', 'role']),
+    ('ix_approval_flows_company_sequence', 'approval_flows', ['company_id', 'sequence_order']),
+    ('ix_approval_rules_company_id', 'approval_rules', ['company_id']),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+
+    for name, table, columns in INDEXES:
+        if table in tables and name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+
+    for name, table, _ in reversed(INDEXES):
+        if table in tables and name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
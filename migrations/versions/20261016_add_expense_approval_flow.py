@@ -0,0 +1,44 @@
+"""Add approval_flow_id to expenses
+
+Revision ID: 20261016_expense_approval_flow
+Revises: 20261016_expense_employee_idx
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_expense_approval_flow'
+down_revision = '20261016_expense_employee_idx'
+branch_labels = None
+depends_on = None
+
+
+FK_NAME = 'fk_expenses_approval_flow_id'
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [column['name'] for column in inspector.get_columns('expenses')]
+    foreign_keys = [fk['name'] for fk in inspector.get_foreign_keys('expenses')]
+    # Batch mode lets SQLite, which cannot ALTER in a constraint, rebuild the table.
+    with op.batch_alter_table('expenses') as batch_op:
+        if 'approval_flow_id' not in columns:
+            batch_op.add_column(sa.Column('approval_flow_id', sa.Integer(), nullable=True))
+        if FK_NAME not in foreign_keys:
+            batch_op.create_foreign_key(FK_NAME, 'approval_flows', ['approval_flow_id'], ['id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [column['name'] for column in inspector.get_columns('expenses')]
+    foreign_keys = [fk['name'] for fk in inspector.get_foreign_keys('expenses')]
+    with op.batch_alter_table('expenses') as batch_op:
+        if FK_NAME in foreign_keys:
+            batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        if 'approval_flow_id' in columns:
+            batch_op.drop_column('approval_flow_id')
@@ -0,0 +1,55 @@
+"""Backfill expenses.current_approver_id and index (current_approver_id, status, created_at)
+
+Revision ID: 20261016_expense_approver_idx
+Revises: 20261016_approval_history_idx
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_expense_approver_idx'
+down_revision = '20261016_approval_history_idx'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = 'ix_expenses_approver_status_created'
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expenses' not in inspector.get_table_names():
+        return
+
+    columns = {column['name'] for column in inspector.get_columns('expenses')}
+    if 'approval_flow_id' in columns and 'approval_flows' in inspector.get_table_names():
+        # Expenses routed through a flow before current_approver_id was maintained.
+        op.execute(
+            """
+            UPDATE expenses
+            SET current_approver_id = (
+                SELECT approval_flows.approver_id FROM approval_flows
+                WHERE approval_flows.id = expenses.approval_flow_id
+            )
+            WHERE current_approver_id IS NULL AND approval_flow_id IS NOT NULL
+            """
+        )
+
+    indexes = {index['name'] for index in inspector.get_indexes('expenses')}
+    if INDEX_NAME not in indexes:
+        op.create_index(INDEX_NAME, 'expenses', ['current_approver_id', 'status', 'created_at'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expenses' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('expenses')}
+    if INDEX_NAME in indexes:
+        op.drop_index(INDEX_NAME, table_name='expenses')
@@ -0,0 +1,41 @@
+"""Add expenses (company_id, status, created_at) index for company approval queues
+
+Revision ID: 20261016_expense_company_idx
+Revises: 20261016_hash_user_otp_codes
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_expense_company_idx'
+down_revision = '20261016_hash_user_otp_codes'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = 'ix_expenses_company_status_created'
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expenses' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('expenses')}
+    if INDEX_NAME not in indexes:
+        op.create_index(INDEX_NAME, 'expenses', ['company_id', 'status', 'created_at'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expenses' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('expenses')}
+    if INDEX_NAME in indexes:
+        op.drop_index(INDEX_NAME, table_name='expenses')
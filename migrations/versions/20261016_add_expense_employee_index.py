@@ -0,0 +1,38 @@
+"""Add expenses (employee_id, created_at) index
+
+Revision ID: 20261016_expense_employee_idx
+Revises: 20261016_company_indexes
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_expense_employee_idx'
+down_revision = '20261016_company_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expenses' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('expenses')}
+    if 'ix_expenses_employee_created' not in indexes:
+        op.create_index('ix_expenses_employee_created', 'expenses', ['employee_id', 'created_at'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expenses' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('expenses')}
+    if 'ix_expenses_employee_created' in indexes:
+        op.drop_index('ix_expenses_employee_created', table_name='expenses')
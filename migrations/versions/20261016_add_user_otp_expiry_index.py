@@ -0,0 +1,48 @@
+"""Add partial index on users.otp_expiry for the expired-OTP sweep
+
+Revision ID: 20261016_user_otp_expiry_idx
+Revises: 20261016_expense_approver_idx
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_user_otp_expiry_idx'
+down_revision = '20261016_expense_approver_idx'
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = 'ix_users_otp_expiry'
+ACTIVE_OTP = sa.text('otp_expiry IS NOT NULL')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('users')}
+    if INDEX_NAME not in indexes:
+        op.create_index(
+            INDEX_NAME,
+            'users',
+            ['otp_expiry'],
+            postgresql_where=ACTIVE_OTP,
+            sqlite_where=ACTIVE_OTP,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    indexes = {index['name'] for index in inspector.get_indexes('users')}
+    if INDEX_NAME in indexes:
+        op.drop_index(INDEX_NAME, table_name='users')
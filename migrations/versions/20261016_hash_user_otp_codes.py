@@ -0,0 +1,49 @@
+"""Widen users.otp_code to hold a keyed hash and drop plaintext codes
+
+Revision ID: 20261016_hash_user_otp_codes
+Revises: 20261016_user_otp_expiry_idx
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261016_hash_user_otp_codes'
+down_revision = '20261016_user_otp_expiry_idx'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    # Outstanding plaintext codes can no longer be verified; they expire within minutes anyway.
+    op.execute("UPDATE users SET otp_code = NULL, otp_expiry = NULL WHERE otp_code IS NOT NULL")
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column(
+            'otp_code',
+            existing_type=sa.String(length=6),
+            type_=sa.String(length=64),
+            existing_nullable=True,
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    op.execute("UPDATE users SET otp_code = NULL, otp_expiry = NULL WHERE otp_code IS NOT NULL")
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column(
+            'otp_code',
+            existing_type=sa.String(length=64),
+            type_=sa.String(length=6),
+            existing_nullable=True,
+        )
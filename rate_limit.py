@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from flask import session
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+limiter = Limiter(key_func=get_remote_address)
+
+
+def session_user_key() -> str:
+	"""Rate-limit key for signed-in actions: the user, or the client address when anonymous."""
+	user_id = session.get("user_id")
+	return f"user:{user_id}" if user_id else get_remote_address()
+
+
+def pending_otp_key(session_key: str):
+	"""Build a key function that limits OTP attempts per account awaiting verification."""
+
+	def key() -> str:
+		user_id = session.get(session_key)
+		return f"otp:{session_key}:{user_id}" if user_id else get_remote_address()
+
+	return key